@@ -0,0 +1,118 @@
+"""Admission control for expensive routes.
+
+``AdmissionController`` combines a per-key token bucket with a bounded
+concurrency gate. Excess work is rejected up front instead of piling up
+on the event loop: 429 when a caller exceeds its rate, and 503 when the
+wait queue is full or a queued request misses its deadline. Both carry
+Retry-After.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from metrics import registry
+
+ADMISSION_IN_FLIGHT = registry.gauge("admission_in_flight", "Requests admitted and running.", ("controller",))
+ADMISSION_QUEUE_DEPTH = registry.gauge("admission_queue_depth", "Requests waiting for a concurrency slot.", ("controller",))
+ADMISSION_REJECTIONS = registry.counter("admission_rejections_total", "Requests rejected by admission control.", ("controller", "reason"))
+ADMISSION_WAIT = registry.histogram("admission_wait_seconds", "Time spent queued before admission.", ("controller",))
+
+
+class AdmissionRejected(HTTPException):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class TokenBucketLimiter:
+    """``rate`` tokens per second per key, up to ``burst``; a rate of 0 disables limiting."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+
+    def acquire(self, key) -> float:
+        """Take a token for ``key``; returns 0 on success, otherwise seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now):
+        # Buckets idle long enough to have refilled are indistinguishable from new ones
+        idle = self.burst / self.rate
+        self._buckets = {key: value for key, value in self._buckets.items() if now - value[1] < idle}
+
+
+class AdmissionController:
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float,
+                 rate: float = 0.0, burst: float = 1.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.limiter = TokenBucketLimiter(rate, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _reject(self, status_code, reason, detail, retry_after):
+        ADMISSION_REJECTIONS.inc(controller=self.name, reason=reason)
+        raise AdmissionRejected(status_code, detail, retry_after)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+    def check_rate(self, key):
+        retry_after = self.limiter.acquire(key)
+        if retry_after:
+            self._reject(429, "rate_limited", "Too many requests, please slow down", retry_after)
+
+    @asynccontextmanager
+    async def admit(self, key=None):
+        """Hold a concurrency slot; ``key`` is also charged against its rate limit when given."""
+        if key is not None:
+            self.check_rate(key)
+
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self._reject(503, "queue_full", "Server is busy, please retry shortly", self.queue_timeout)
+            self.waiting += 1
+            ADMISSION_QUEUE_DEPTH.set(self.waiting, controller=self.name)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject(503, "queue_timeout", "Server is busy, please retry shortly", self.queue_timeout)
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUE_DEPTH.set(self.waiting, controller=self.name)
+                ADMISSION_WAIT.observe(time.perf_counter() - start, controller=self.name)
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight, controller=self.name)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            ADMISSION_IN_FLIGHT.set(self.in_flight, controller=self.name)
+            self._semaphore.release()
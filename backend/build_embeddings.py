@@ -0,0 +1,116 @@
+"""Build the product embedding index offline.
+
+    python build_embeddings.py                      # resumes an interrupted build
+    python build_embeddings.py --fresh --workers 8 --chunk-size 512
+
+Streams the catalog from the database in id order, encodes chunks in
+parallel across a process pool (one model per process, sized to the CPU
+count by default) and appends the vectors to the on-disk index with a
+checkpoint after each chunk. Chunks are written in catalog order, so the
+checkpoint is just the last product id written and an interrupted build
+picks up after it. A build started for an older catalog version starts
+over. When it completes, the index replaces the live one and the
+"embeddings" catalog version is bumped so running workers reload it.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from embedding_index import EMBEDDING_INDEX_PATH, MODEL_NAME, PRODUCT_FIELDS, EmbeddingIndexWriter, product_text
+from repositories import create_repositories
+
+_model = None
+
+
+def _init_worker(model_name):
+    global _model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # The pool provides the parallelism; one thread per process avoids oversubscribing cores
+    torch.set_num_threads(1)
+    _model = SentenceTransformer(model_name)
+
+
+def _encode(texts):
+    return _model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+async def build_index(repos, path, workers, chunk_size, fresh=False, model_name=MODEL_NAME, executor=None):
+    """Encode the catalog into the index at ``path``; ``executor`` replaces the process pool, with ``_model`` set by the caller."""
+    versions = await repos.catalog_versions.get()
+    products_version = ((versions or {}).get("components") or {}).get("products", {}).get("version")
+    writer = EmbeddingIndexWriter(path, model_name, products_version, resume=not fresh)
+    if writer.resumed:
+        print(f"Resuming after product {writer.last_id} ({writer.count} products already encoded)")
+
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    encoded, start, last_report = 0, time.perf_counter(), time.perf_counter()
+
+    async def write_ready(keep):
+        # Chunks are written in order, so the checkpoint always covers a prefix of the catalog
+        nonlocal encoded, last_report
+        while len(pending) > keep:
+            ids, future = pending.popleft()
+            writer.append(ids, await future)
+            encoded += len(ids)
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                print(f"Encoded {writer.count} products ({encoded / (now - start):.1f} products/s)")
+                last_report = now
+
+    try:
+        with nullcontext(executor) if executor else ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_name,)) as pool:
+            async for chunk in repos.products.stream(after_id=writer.last_id, chunk_size=chunk_size, fields=PRODUCT_FIELDS):
+                ids = [product["id"] for product in chunk]
+                pending.append((ids, loop.run_in_executor(pool, _encode, [product_text(product) for product in chunk])))
+                # Two chunks per process keeps every worker busy without reading the catalog ahead
+                await write_ready(keep=workers * 2)
+            await write_ready(keep=0)
+    except BaseException:
+        writer.close()
+        raise
+
+    writer.finish()
+    await repos.catalog_versions.bump("embeddings")
+    elapsed = time.perf_counter() - start
+    print(f"Built index of {writer.count} products at {path}: {encoded} encoded in {elapsed:.1f}s "
+          f"({encoded / elapsed if elapsed else 0:.1f} products/s)")
+    return writer.manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the product embedding index offline")
+    parser.add_argument("--path", default=EMBEDDING_INDEX_PATH, help="index directory (default: EMBEDDING_INDEX_PATH)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="encoding processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="products per encoded chunk and checkpoint")
+    parser.add_argument("--fresh", action="store_true", help="discard any interrupted build instead of resuming it")
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args()
+
+    repos = create_repositories("mongo", os.environ.get('MONGO_URL'), os.environ.get('DB_NAME'))
+    try:
+        asyncio.run(build_index(repos, args.path, args.workers, args.chunk_size, args.fresh, args.model))
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume from the last checkpoint")
+        return 1
+    finally:
+        repos.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
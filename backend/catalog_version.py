@@ -0,0 +1,121 @@
+"""Cross-worker catalog version tracking.
+
+A catalog sync only runs on one worker, but every worker holds caches
+derived from the catalog. The syncing worker bumps a shared version
+document (``CatalogVersionRepository``) with a counter per component
+("products", and any index built from it), and each worker runs a
+``CatalogVersionWatcher`` that follows that document: through a change
+stream when the database supports one, otherwise by reading it by _id
+every ``poll_interval`` seconds. When a component's counter moves, only
+the handlers registered for that component run, so every worker's caches
+converge within one poll interval of a sync and unrelated caches are kept.
+"""
+import asyncio
+import inspect
+import os
+
+from metrics import registry
+from scheduler import aware_utc
+
+CATALOG_VERSION = registry.gauge("catalog_component_version", "Catalog component version this worker has applied.", ("component",))
+CATALOG_INVALIDATIONS = registry.counter("catalog_cache_invalidations_total", "Cache rebuilds triggered by a catalog version change.", ("component",))
+
+
+class CatalogVersionWatcher:
+    def __init__(self, versions, poll_interval: float = 2.0, change_streams: bool = True):
+        self.versions = versions
+        self.poll_interval = poll_interval
+        self.change_streams = change_streams
+        self.version = 0
+        # component -> {"version", "updated_at"} as last applied on this worker
+        self.components = {}
+        self.mode = None
+        self._handlers = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    @classmethod
+    def from_env(cls, versions):
+        return cls(
+            versions,
+            poll_interval=float(os.environ.get('CATALOG_VERSION_POLL_INTERVAL', '2')),
+            change_streams=os.environ.get('CATALOG_VERSION_CHANGE_STREAMS', 'true').lower() == 'true',
+        )
+
+    def on_change(self, component: str, handler):
+        """Call ``handler(state)`` whenever ``component`` moves; ``state`` has its version and updated_at."""
+        self._handlers.setdefault(component, []).append(handler)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "mode": self.mode,
+            "components": {name: state["version"] for name, state in self.components.items()},
+        }
+
+    async def apply(self, document) -> list:
+        """Bring this worker up to ``document``; returns the components whose caches were rebuilt."""
+        if not document:
+            return []
+        async with self._lock:
+            # Change streams and polls can deliver the same or an older document
+            if document["version"] <= self.version:
+                return []
+            stale = []
+            for name, state in (document.get("components") or {}).items():
+                if state["version"] != self.components.get(name, {}).get("version"):
+                    self.components[name] = {"version": state["version"], "updated_at": aware_utc(state.get("updated_at"))}
+                    stale.append(name)
+            self.version = document["version"]
+            for name in stale:
+                CATALOG_VERSION.set(self.components[name]["version"], component=name)
+                for handler in self._handlers.get(name, ()):
+                    CATALOG_INVALIDATIONS.inc(component=name)
+                    try:
+                        result = handler(self.components[name])
+                        if inspect.isawaitable(result):
+                            await result
+                    except Exception as e:
+                        print(f"Error refreshing {name} caches: {e}")
+            return stale
+
+    async def refresh(self) -> list:
+        return await self.apply(await self.versions.get())
+
+    async def publish(self, *components: str) -> list:
+        """Record that this worker changed ``components`` and apply it locally right away."""
+        return await self.apply(await self.versions.bump(*components))
+
+    async def _follow_stream(self, stream):
+        async for document in stream:
+            # None marks the stream as open; anything committed before that is picked up by a read
+            await (self.refresh() if document is None else self.apply(document))
+
+    async def _loop(self):
+        stream = self.versions.watch() if self.change_streams else None
+        if stream is not None:
+            self.mode = "change_stream"
+            try:
+                await self._follow_stream(stream)
+            except Exception as e:
+                print(f"Catalog version change stream unavailable ({e}); polling instead")
+        self.mode = "poll"
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error reading catalog version: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,158 @@
+"""On-disk product embedding index.
+
+Built offline by ``build_embeddings.py``. A build appends vectors to
+``<path>.partial`` one chunk at a time and checkpoints the manifest after
+each chunk, so an interrupted build resumes after the last product it
+wrote. A finished build is swapped in at ``<path>``:
+
+    manifest.json   model, dim, count, last_id, products_version, complete
+    vectors.f32     count x dim float32 rows, L2-normalized
+    ids.i64         count int64 product ids, aligned with the rows
+
+Workers memory-map the finished index, so every process on a host shares
+one copy through the page cache.
+"""
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_INDEX_PATH = os.environ.get('EMBEDDING_INDEX_PATH', str(Path(__file__).parent / 'embeddings'))
+
+MANIFEST = "manifest.json"
+VECTORS = "vectors.f32"
+IDS = "ids.i64"
+
+# Product fields read to build the embedding text
+PRODUCT_FIELDS = ("id", "title", "description", "category")
+
+
+def product_text(product):
+    # Combine title, description, and category for embedding
+    return f"{product.get('title', '')} {product.get('description', '')} {product.get('category', '')}"
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(path, manifest):
+    # Write-then-rename so a crash never leaves a torn checkpoint
+    temporary = os.path.join(path, MANIFEST + ".tmp")
+    with open(temporary, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, os.path.join(path, MANIFEST))
+
+
+class EmbeddingIndexWriter:
+    def __init__(self, path: str, model: str, products_version=None, resume: bool = True):
+        self.path = path
+        self.partial = path + ".partial"
+        manifest = read_manifest(self.partial) if resume else None
+        self.resumed = bool(manifest and manifest["model"] == model and manifest.get("products_version") == products_version)
+        if self.resumed:
+            self.manifest = manifest
+        else:
+            shutil.rmtree(self.partial, ignore_errors=True)
+            os.makedirs(self.partial)
+            self.manifest = {
+                "model": model,
+                "dim": None,
+                "count": 0,
+                "last_id": None,
+                "products_version": products_version,
+                "complete": False,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+            }
+            _write_manifest(self.partial, self.manifest)
+        self._vectors = open(os.path.join(self.partial, VECTORS), "ab")
+        self._ids = open(os.path.join(self.partial, IDS), "ab")
+        # Rows appended after the last checkpoint are written again
+        self._vectors.truncate(self.manifest["count"] * (self.manifest["dim"] or 0) * 4)
+        self._ids.truncate(self.manifest["count"] * 8)
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def last_id(self):
+        return self.manifest["last_id"]
+
+    def append(self, ids, vectors):
+        """Write one chunk and checkpoint it; ``ids`` must continue in ascending order."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.manifest["dim"] is None:
+            self.manifest["dim"] = int(vectors.shape[1])
+        elif vectors.shape[1] != self.manifest["dim"]:
+            raise ValueError(f"Expected {self.manifest['dim']}-dimensional vectors, got {vectors.shape[1]}")
+        for handle, data in ((self._vectors, vectors), (self._ids, np.asarray(ids, dtype=np.int64))):
+            handle.write(data.tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+        self.manifest["count"] += len(ids)
+        self.manifest["last_id"] = int(ids[-1])
+        _write_manifest(self.partial, self.manifest)
+
+    def close(self):
+        self._vectors.close()
+        self._ids.close()
+
+    def finish(self):
+        """Mark the build complete and swap it in for the live index."""
+        self.close()
+        self.manifest["complete"] = True
+        self.manifest["completed_at"] = datetime.now(timezone.utc).isoformat()
+        _write_manifest(self.partial, self.manifest)
+        previous = self.path + ".previous"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(self.path):
+            # Workers that still map the old files keep reading them until they reload
+            os.replace(self.path, previous)
+        os.replace(self.partial, self.path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+class EmbeddingIndex:
+    def __init__(self, manifest, ids, vectors):
+        self.manifest = manifest
+        self.ids = ids
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def products_version(self):
+        return self.manifest.get("products_version")
+
+    @classmethod
+    def load(cls, path: str = EMBEDDING_INDEX_PATH, model: str = MODEL_NAME):
+        """The finished index at ``path``, or None when there is none for ``model``."""
+        manifest = read_manifest(path)
+        if not manifest or not manifest.get("complete") or manifest["model"] != model or not manifest["count"]:
+            return None
+        count, dim = manifest["count"], manifest["dim"]
+        vectors = np.memmap(os.path.join(path, VECTORS), dtype=np.float32, mode="r", shape=(count, dim))
+        ids = np.fromfile(os.path.join(path, IDS), dtype=np.int64, count=count)
+        return cls(manifest, ids, vectors)
+
+    def search(self, query_vector, limit: int):
+        """``(product_id, cosine score)`` pairs for the ``limit`` closest products, best first."""
+        scores = self.vectors @ np.asarray(query_vector, dtype=np.float32)
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[index]), float(scores[index])) for index in top]
@@ -0,0 +1,64 @@
+"""Conditional GET support for catalog routes.
+
+Catalog responses depend only on the request URL and the catalog contents,
+and the catalog only changes when a sync runs. ``CatalogHTTPCache`` turns
+a version that the sync bumps into ETag/Last-Modified headers, so a
+matching If-None-Match or If-Modified-Since is answered with 304 before
+any database work.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+# Cache-Control per catalog route; revalidation is cheap, so keep max-age short
+CACHE_POLICIES = {
+    "products": "public, max-age=60, stale-while-revalidate=300",
+    "product": "public, max-age=300, stale-while-revalidate=600",
+    "suggest": "public, max-age=60, stale-while-revalidate=300",
+}
+
+
+class CatalogHTTPCache:
+    def __init__(self, version: int = 0, updated_at: datetime = None):
+        self.version = version
+        self.updated_at = (updated_at or datetime.now(timezone.utc)).replace(microsecond=0)
+
+    def bump(self, version: int = None, updated_at: datetime = None):
+        self.version = self.version + 1 if version is None else version
+        self.updated_at = (updated_at or datetime.now(timezone.utc)).replace(microsecond=0)
+
+    def etag(self, request: Request) -> str:
+        url = request.url.path + ("?" + request.url.query if request.url.query else "")
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        return f'W/"{self.version}-{digest}"'
+
+    def headers(self, request: Request, policy: str) -> dict:
+        return {
+            "ETag": self.etag(request),
+            "Last-Modified": format_datetime(self.updated_at, usegmt=True),
+            "Cache-Control": CACHE_POLICIES[policy],
+        }
+
+    def is_fresh(self, request: Request, headers: dict) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.1.3)
+            tags = {tag.strip() for tag in if_none_match.split(",")}
+            etag = headers["ETag"]
+            return "*" in tags or etag in tags or etag[2:] in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return self.updated_at <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def check(self, request: Request, policy: str):
+        """Return ``(headers, response)``; ``response`` is a ready 304 when the client copy is current."""
+        headers = self.headers(request, policy)
+        if self.is_fresh(request, headers):
+            return headers, Response(status_code=304, headers=headers)
+        return headers, None
@@ -0,0 +1,251 @@
+"""Upstream catalog ingestion.
+
+``CatalogIngestor`` keeps one pooled ``httpx.AsyncClient`` for the life of
+the process. It fetches every configured source with bounded parallelism
+and sends conditional requests (If-None-Match / If-Modified-Since), so an
+unchanged upstream costs a round of 304s and no database writes. Response
+bodies are parsed incrementally and written to the repository in batches,
+so the whole payload never sits in memory at once.
+
+A source URL containing ``{page}`` is paginated: pages 1, 2, ... are
+fetched a window at a time until a page is empty or missing. Several
+comma-separated URLs are treated as shards of one catalog.
+"""
+import asyncio
+import codecs
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import List, Optional
+
+import httpx
+
+DEFAULT_SOURCE = "https://fakestoreapi.com/products"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# A top-level number whose buffer ends in these characters may continue in the next chunk
+NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+# Fetch outcomes besides a product count
+UNCHANGED = "unchanged"
+MISSING = "missing"
+
+
+class JSONArrayStreamParser:
+    """Yields the elements of a top-level JSON array fed in as byte chunks."""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._started = False
+        self._finished = False
+
+    def feed(self, chunk: bytes) -> list:
+        self._buffer += self._text.decode(chunk)
+        return self._drain(final=False)
+
+    def close(self) -> list:
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._drain(final=True)
+        if not self._finished:
+            raise ValueError("Truncated JSON array in upstream response")
+        return items
+
+    def _drain(self, final):
+        items, buffer, pos = [], self._buffer, 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if self._finished:
+                raise ValueError("Unexpected data after JSON array")
+            if not self._started:
+                if char != "[":
+                    raise ValueError("Upstream response is not a JSON array")
+                self._started, pos = True, pos + 1
+            elif char == "]":
+                self._finished, pos = True, pos + 1
+            elif char == ",":
+                pos += 1
+            else:
+                try:
+                    item, end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # element not complete yet
+                if not final:
+                    # "109" parses from "109." too; wait until something other than number characters follows
+                    rest = end
+                    while rest < len(buffer) and buffer[rest] in NUMBER_CHARS:
+                        rest += 1
+                    if rest == len(buffer):
+                        break
+                items.append(item)
+                pos = end
+        self._buffer = buffer[pos:]
+        return items
+
+
+@dataclass
+class SyncResult:
+    changed: bool
+    count: Optional[int] = None
+    requests: int = 0
+
+
+class _RetryableStatus(Exception):
+    pass
+
+
+class CatalogIngestor:
+    def __init__(self, sources: List[str], concurrency: int = 4, timeout: float = 30.0, retries: int = 3,
+                 backoff: float = 0.5, batch_size: int = 1000, max_pages: int = 1000):
+        self.sources = sources
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.max_pages = max_pages
+        # url -> {"etag", "last_modified", "count"} from the last committed sync; callers running
+        # on several workers load and save them through CatalogVersionRepository
+        self.validators = {}
+        self._client = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls):
+        sources = [url.strip() for url in os.environ.get('CATALOG_SOURCE_URLS', DEFAULT_SOURCE).split(",") if url.strip()]
+        return cls(
+            sources,
+            concurrency=int(os.environ.get('CATALOG_FETCH_CONCURRENCY', '4')),
+            timeout=float(os.environ.get('CATALOG_FETCH_TIMEOUT', '30')),
+            retries=int(os.environ.get('CATALOG_FETCH_RETRIES', '3')),
+            batch_size=int(os.environ.get('CATALOG_BATCH_SIZE', '1000')),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 10.0)),
+                limits=httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency),
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _conditional_headers(self, url):
+        validators = self.validators.get(url, {})
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    async def _fetch(self, url, conditional, writer, semaphore, state):
+        """Stream one URL into ``writer``; returns a product count, UNCHANGED or MISSING."""
+        headers = self._conditional_headers(url) if conditional else {}
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    state["requests"] += 1
+                    async with self.client.stream("GET", url, headers=headers) as response:
+                        if response.status_code == 304:
+                            return UNCHANGED
+                        if response.status_code == 404:
+                            return MISSING
+                        if response.status_code in RETRYABLE_STATUS:
+                            raise _RetryableStatus(f"{url} returned {response.status_code}")
+                        response.raise_for_status()
+
+                        parser, batch, count = JSONArrayStreamParser(), [], 0
+                        async for chunk in response.aiter_bytes():
+                            batch.extend(parser.feed(chunk))
+                            if len(batch) >= self.batch_size:
+                                await writer.write(batch)
+                                count, batch = count + len(batch), []
+                        batch.extend(parser.close())
+                        if batch:
+                            await writer.write(batch)
+                            count += len(batch)
+
+                        state["validators"][url] = {
+                            "etag": response.headers.get("etag"),
+                            "last_modified": response.headers.get("last-modified"),
+                            "count": count,
+                        }
+                        return count
+            except (httpx.TransportError, _RetryableStatus) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+                print(f"Retrying {url} in {delay:.2f}s after error: {e}")
+                await asyncio.sleep(delay)
+
+    async def _fetch_source(self, source, conditional, writer, semaphore, state):
+        if "{page}" not in source:
+            return {source: await self._fetch(source, conditional, writer, semaphore, state)}
+
+        outcomes, page = {}, 1
+        while page <= self.max_pages:
+            urls = [source.format(page=number) for number in range(page, min(page + self.concurrency, self.max_pages + 1))]
+            results = await asyncio.gather(*(self._fetch(url, conditional, writer, semaphore, state) for url in urls))
+            outcomes.update(zip(urls, results))
+            # An unchanged page that was empty last time still marks the end
+            if any(result == MISSING or result == 0 or (result == UNCHANGED and self.validators.get(url, {}).get("count") == 0)
+                   for url, result in zip(urls, results)):
+                break
+            page += len(urls)
+        return outcomes
+
+    def _holds_same_urls(self, outcomes):
+        """Whether only 304s came back with products, from exactly the URLs that held them last time.
+
+        A page or shard that used to hold products and now comes back empty or missing, or is no
+        longer fetched at all, means the catalog shrank even though everything else answered 304.
+        """
+        if any(isinstance(outcome, int) and outcome > 0 for outcome in outcomes.values()):
+            return False
+        previous = {url for url, validators in self.validators.items() if validators.get("count")}
+        current = {url for url, outcome in outcomes.items() if outcome == UNCHANGED and self.validators.get(url, {}).get("count")}
+        return current == previous
+
+    async def sync(self, repository) -> SyncResult:
+        """Refresh ``repository`` from the upstream sources; a no-op when nothing changed."""
+        async with self._lock:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            state = {"requests": 0, "validators": {}}
+            writer = await repository.begin_replace()
+            try:
+                outcomes = {}
+                for result in await asyncio.gather(*(self._fetch_source(source, True, writer, semaphore, state) for source in self.sources)):
+                    outcomes.update(result)
+
+                unchanged = [url for url, outcome in outcomes.items() if outcome == UNCHANGED]
+                if unchanged and self._holds_same_urls(outcomes):
+                    await writer.abort()
+                    return SyncResult(changed=False, requests=state["requests"])
+                # Part of the catalog changed; unchanged shards must be re-read to rebuild it in full
+                await asyncio.gather(*(self._fetch(url, False, writer, semaphore, state) for url in unchanged))
+
+                count = await writer.count()
+                if count == 0:
+                    raise ValueError("Upstream returned no products")
+                await writer.commit()
+            except BaseException:
+                await writer.abort()
+                raise
+
+            self.validators = state["validators"]
+            return SyncResult(changed=True, count=count, requests=state["requests"])
@@ -0,0 +1,224 @@
+"""In-process metrics with a Prometheus text exposition.
+
+Only what the backend needs: counters, gauges and fixed-bucket histograms
+keyed by label values, an ASGI middleware that times requests per route
+template, and ``timed`` / ``instrument_repositories`` for the inner stages
+(database calls, model encode, similarity scoring, top-k).
+"""
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+# Seconds; spans fast cache hits up to multi-second AI queries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_series(self, key, series):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, series["counts"]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {series['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests currently being served by route template.", ("method", "route"))
+STAGE_LATENCY = registry.histogram("stage_duration_seconds", "Latency of inner request stages.", ("stage", "operation"))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def timed(stage, operation=""):
+    """Context manager recording the enclosed block under ``stage_duration_seconds``."""
+    return STAGE_LATENCY.time(stage=stage, operation=operation)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and in-flight counts per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route_template(self, scope):
+        # Resolve the template up front so in-flight counts are labelled before the handler runs
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, route = scope["method"], self._route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method=method, route=route)
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method=method, route=route, status=status_code)
+
+
+class _InstrumentedRepository:
+    def __init__(self, name, repository):
+        self._name = name
+        self._repository = repository
+
+    def __getattr__(self, attr):
+        value = getattr(self._repository, attr)
+        if not inspect.iscoroutinefunction(value):
+            return value
+        operation = f"{self._name}.{attr}"
+
+        async def wrapper(*args, **kwargs):
+            with timed("db", operation):
+                return await value(*args, **kwargs)
+
+        return wrapper
+
+
+def instrument_repositories(repos, names=("products", "users", "cart", "wishlist", "orders", "leases", "catalog_versions")):
+    """Wrap each repository on ``repos`` so every call is timed as a ``db`` stage."""
+    for name in names:
+        setattr(repos, name, _InstrumentedRepository(name, getattr(repos, name)))
+    return repos
@@ -0,0 +1,178 @@
+"""Opt-in cProfile capture for sampled and slow requests.
+
+``RequestProfiler`` is switched on at runtime through the admin routes. A
+request is profiled when it is randomly sampled or, with a slow threshold
+set, whenever no other profile is running; the capture is kept if it was
+sampled or took longer than the threshold. The newest captures live in a
+fixed-size ring buffer and can be downloaded as pstats files.
+
+The event loop is shared, so a capture also contains any work other
+requests did while it was running. Only one request is profiled at a time.
+cProfile only sees the thread it was enabled on, so CPU work a request
+hands to a thread goes through ``to_thread_profiled``, which profiles it
+there and merges it into the request's capture.
+"""
+import asyncio
+import contextvars
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# Profiles of thread work done for the request being captured
+_thread_profiles = contextvars.ContextVar("profiling_thread_profiles", default=None)
+
+
+def _run_profiled(profiles, func, *args, **kwargs):
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        profiles.append(profile)
+
+
+async def to_thread_profiled(func, *args, **kwargs):
+    """``asyncio.to_thread`` that includes ``func`` in the capture when the current request is profiled."""
+    profiles = _thread_profiles.get()
+    if profiles is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return await asyncio.to_thread(_run_profiled, profiles, func, *args, **kwargs)
+
+
+class RequestProfiler:
+    def __init__(self, enabled=False, sample_rate=0.01, slow_threshold_ms=1000.0, max_profiles=20):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.profiles = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._active = False
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true',
+            sample_rate=float(os.environ.get('PROFILING_SAMPLE_RATE', '0.01')),
+            slow_threshold_ms=float(os.environ.get('PROFILING_SLOW_MS', '1000')),
+            max_profiles=int(os.environ.get('PROFILING_MAX_PROFILES', '20')),
+        )
+
+    @property
+    def max_profiles(self):
+        return self.profiles.maxlen
+
+    def configure(self, enabled=None, sample_rate=None, slow_threshold_ms=None, max_profiles=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        if slow_threshold_ms is not None:
+            self.slow_threshold_ms = max(slow_threshold_ms, 0.0)
+        if max_profiles is not None and max_profiles != self.profiles.maxlen:
+            self.profiles = deque(self.profiles, maxlen=max(max_profiles, 1))
+
+    def config(self):
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "max_profiles": self.max_profiles,
+        }
+
+    def start_request(self):
+        if not self.enabled or self._active:
+            return None
+        sampled = random.random() < self.sample_rate
+        if not sampled and not self.slow_threshold_ms:
+            return None
+        self._active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile, sampled
+
+    def finish_request(self, profile, sampled, duration_ms, request_info, thread_profiles=()):
+        profile.disable()
+        self._active = False
+        slow = bool(self.slow_threshold_ms) and duration_ms >= self.slow_threshold_ms
+        if not (sampled or slow):
+            return
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        if thread_profiles:
+            stats.add(*thread_profiles)
+        self.profiles.append({
+            "id": next(self._ids),
+            "reason": "slow" if slow else "sampled",
+            "duration_ms": round(duration_ms, 3),
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            **request_info,
+            "stats": marshal.dumps(stats.stats),
+        })
+
+    def list_profiles(self):
+        summaries = [{key: value for key, value in entry.items() if key != "stats"} for entry in self.profiles]
+        return sorted(summaries, key=lambda entry: entry["duration_ms"], reverse=True)
+
+    def get(self, profile_id):
+        return next((entry for entry in self.profiles if entry["id"] == profile_id), None)
+
+    def clear(self):
+        self.profiles.clear()
+
+    @staticmethod
+    def render_text(entry, sort="cumulative", limit=40):
+        stats = pstats.Stats(_LoadedProfile(marshal.loads(entry["stats"])), stream=io.StringIO())
+        stats.sort_stats(sort).print_stats(limit)
+        return stats.stream.getvalue()
+
+
+class _LoadedProfile:
+    # pstats.Stats accepts any object exposing create_stats() and a .stats dict
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that feeds requests through a ``RequestProfiler``."""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        started = self.profiler.start_request() if scope["type"] == "http" else None
+        if started is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile, sampled = started
+        status_code = 500
+        thread_profiles = []
+        token = _thread_profiles.set(thread_profiles)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _thread_profiles.reset(token)
+            route = scope.get("route")
+            self.profiler.finish_request(profile, sampled, (time.perf_counter() - start) * 1000, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status_code,
+            }, thread_profiles)
@@ -0,0 +1,755 @@
+"""Data access for the shopping backend.
+
+Routes in server.py talk to a ``Repositories`` bundle instead of the Motor
+database directly. ``MongoRepositories`` is the production backend; the
+``InMemoryRepositories`` backend keeps everything in process dictionaries so
+the whole API can be driven and profiled without a running MongoDB.
+"""
+import copy
+import re
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+
+# Sort keys accepted by the product listing route
+PRODUCT_SORTS = {
+    "price_asc": [("price", 1)],
+    "price_desc": [("price", -1)],
+    "rating": [("rating.rate", -1)],
+}
+DEFAULT_PRODUCT_SORT = [("id", 1)]
+
+
+def product_sort_criteria(sort: Optional[str]):
+    return PRODUCT_SORTS.get(sort, DEFAULT_PRODUCT_SORT)
+
+
+# Interfaces
+class CatalogWriter(ABC):
+    """Builds a replacement catalog in batches; nothing is visible until ``commit``."""
+
+    @abstractmethod
+    async def write(self, products: List[dict]) -> None: ...
+
+    @abstractmethod
+    async def count(self) -> int: ...
+
+    @abstractmethod
+    async def commit(self) -> None: ...
+
+    @abstractmethod
+    async def abort(self) -> None: ...
+
+
+class ProductRepository(ABC):
+    @abstractmethod
+    async def get(self, product_id: int) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_many(self, product_ids: List[int]) -> List[dict]: ...
+
+    @abstractmethod
+    async def list(self, search: str = None, category: str = None, min_price: float = None, max_price: float = None,
+                   sort: str = None, skip: int = 0, limit: int = 20) -> Tuple[int, List[dict]]: ...
+
+    @abstractmethod
+    async def list_ids(self, search: str = None, category: str = None, min_price: float = None, max_price: float = None,
+                       sort: str = None, skip: int = 0, limit: int = 20) -> Tuple[int, List[int]]: ...
+
+    @abstractmethod
+    async def all(self) -> List[dict]: ...
+
+    @abstractmethod
+    def stream(self, after_id=None, chunk_size: int = 1000, fields=None):
+        """Async iterator over products with id > ``after_id`` in id order, ``chunk_size`` at a time."""
+
+    @abstractmethod
+    async def replace_all(self, products: List[dict]) -> int: ...
+
+    @abstractmethod
+    async def begin_replace(self) -> CatalogWriter: ...
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_by_email(self, email: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def insert(self, user: dict) -> None: ...
+
+
+class CartRepository(ABC):
+    @abstractmethod
+    async def list_for_user(self, user_id: str) -> List[dict]: ...
+
+    @abstractmethod
+    async def find(self, user_id: str, product_id: int) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def insert(self, item: dict) -> None: ...
+
+    @abstractmethod
+    async def set_quantity(self, user_id: str, product_id: int, quantity: int) -> bool: ...
+
+    @abstractmethod
+    async def delete(self, user_id: str, product_id: int) -> bool: ...
+
+    @abstractmethod
+    async def clear(self, user_id: str) -> None: ...
+
+
+class WishlistRepository(ABC):
+    @abstractmethod
+    async def list_for_user(self, user_id: str) -> List[dict]: ...
+
+    @abstractmethod
+    async def find(self, user_id: str, product_id: int) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def insert(self, item: dict) -> None: ...
+
+    @abstractmethod
+    async def delete(self, user_id: str, product_id: int) -> bool: ...
+
+
+class OrderRepository(ABC):
+    @abstractmethod
+    async def insert(self, order: dict) -> None: ...
+
+    @abstractmethod
+    async def page_for_user(self, user_id: str, limit: int, before=None, include_items: bool = True) -> List[dict]:
+        """Newest-first orders; ``before`` is an exclusive ``(created_at, id)`` bound."""
+
+    @abstractmethod
+    async def get_summary(self, user_id: str) -> Optional[dict]:
+        """Per-user totals; history from before summaries were kept is folded in on first read."""
+
+    @abstractmethod
+    async def record_in_summary(self, user_id: str, amount: float, created_at) -> None: ...
+
+
+class LeaseRepository(ABC):
+    """Named, expiring locks so only one worker runs a job at a time."""
+
+    @abstractmethod
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool: ...
+
+    @abstractmethod
+    async def renew(self, name: str, owner: str, ttl: float) -> bool: ...
+
+    @abstractmethod
+    async def release(self, name: str, owner: str, completed: bool = False) -> None:
+        """Give the lease up; ``completed`` records a successful run in ``completed_at``."""
+
+    @abstractmethod
+    async def get(self, name: str) -> Optional[dict]: ...
+
+
+class CatalogVersionRepository(ABC):
+    """One shared document: ``{"version", "components": {name: {"version", "updated_at"}}}``."""
+
+    @abstractmethod
+    async def get(self) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def bump(self, *components: str) -> dict:
+        """Increment the overall version and each named component; returns the new document."""
+
+    @abstractmethod
+    async def get_validators(self, component: str) -> dict:
+        """``{url: {"etag", "last_modified", "count"}}`` saved by the last sync of ``component``."""
+
+    @abstractmethod
+    async def save_validators(self, component: str, validators: dict) -> None: ...
+
+    def watch(self):
+        """Async iterator yielding None once listening, then each new document; None when unsupported."""
+        return None
+
+
+class Repositories:
+    products: ProductRepository
+    users: UserRepository
+    cart: CartRepository
+    wishlist: WishlistRepository
+    orders: OrderRepository
+    leases: LeaseRepository
+    catalog_versions: CatalogVersionRepository
+
+    async def ensure_indexes(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+# MongoDB (Motor) backend
+class MongoCatalogWriter(CatalogWriter):
+    # Writes go to a staging collection that is renamed over the live one on commit
+    def __init__(self, db, target):
+        self.target = target
+        self.staging = db[f"{target.name}_staging_{uuid.uuid4().hex[:8]}"]
+
+    async def open(self):
+        await self.staging.create_index("id", unique=True)
+        return self
+
+    async def write(self, products):
+        from pymongo.errors import BulkWriteError
+
+        try:
+            await self.staging.insert_many([dict(product) for product in products], ordered=False)
+        except BulkWriteError as e:
+            # Duplicate ids (retried pages, overlapping shards) keep the first copy
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    async def count(self):
+        return await self.staging.count_documents({})
+
+    async def commit(self):
+        await self.staging.rename(self.target.name, dropTarget=True)
+
+    async def abort(self):
+        await self.staging.drop()
+
+
+class MongoProductRepository(ProductRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.products
+
+    async def get(self, product_id):
+        return await self.collection.find_one({"id": product_id}, {"_id": 0})
+
+    async def get_many(self, product_ids):
+        return await self.collection.find({"id": {"$in": list(product_ids)}}, {"_id": 0}).to_list(length=None)
+
+    @staticmethod
+    def _filter(search=None, category=None, min_price=None, max_price=None):
+        filter_query = {}
+        if search:
+            filter_query["$or"] = [{"title": {"$regex": search, "$options": "i"}}, {"description": {"$regex": search, "$options": "i"}}]
+        if category:
+            filter_query["category"] = {"$regex": category, "$options": "i"}
+        if min_price is not None or max_price is not None:
+            price_filter = {}
+            if min_price is not None: price_filter["$gte"] = min_price
+            if max_price is not None: price_filter["$lte"] = max_price
+            filter_query["price"] = price_filter
+        return filter_query
+
+    async def _page(self, projection, search, category, min_price, max_price, sort, skip, limit):
+        filter_query = self._filter(search, category, min_price, max_price)
+        total = await self.collection.count_documents(filter_query)
+        cursor = self.collection.find(filter_query, projection).sort(product_sort_criteria(sort)).skip(skip).limit(limit)
+        return total, await cursor.to_list(length=limit)
+
+    async def list(self, search=None, category=None, min_price=None, max_price=None, sort=None, skip=0, limit=20):
+        return await self._page({"_id": 0}, search, category, min_price, max_price, sort, skip, limit)
+
+    async def list_ids(self, search=None, category=None, min_price=None, max_price=None, sort=None, skip=0, limit=20):
+        total, products = await self._page({"_id": 0, "id": 1}, search, category, min_price, max_price, sort, skip, limit)
+        return total, [product["id"] for product in products]
+
+    async def all(self):
+        return await self.collection.find({}, {"_id": 0}).to_list(length=None)
+
+    async def stream(self, after_id=None, chunk_size=1000, fields=None):
+        query = {} if after_id is None else {"id": {"$gt": after_id}}
+        projection = {"_id": 0, **{field: 1 for field in fields or ()}}
+        chunk = []
+        async for product in self.collection.find(query, projection).sort("id", 1).batch_size(chunk_size):
+            chunk.append(product)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def replace_all(self, products):
+        await self.collection.delete_many({})
+        if products:
+            # insert_many mutates its arguments with _id, so hand it copies
+            await self.collection.insert_many([dict(product) for product in products])
+        return len(products)
+
+    async def begin_replace(self):
+        return await MongoCatalogWriter(self.db, self.collection).open()
+
+
+class MongoUserRepository(UserRepository):
+    def __init__(self, db):
+        self.collection = db.users
+
+    async def get(self, user_id):
+        return await self.collection.find_one({"id": user_id}, {"_id": 0})
+
+    async def get_by_email(self, email):
+        return await self.collection.find_one({"email": email}, {"_id": 0})
+
+    async def insert(self, user):
+        await self.collection.insert_one(dict(user))
+
+
+class MongoCartRepository(CartRepository):
+    def __init__(self, db):
+        self.collection = db.cart_items
+
+    async def list_for_user(self, user_id):
+        return await self.collection.find({"user_id": user_id}, {"_id": 0}).to_list(length=None)
+
+    async def find(self, user_id, product_id):
+        return await self.collection.find_one({"user_id": user_id, "product_id": product_id}, {"_id": 0})
+
+    async def insert(self, item):
+        await self.collection.insert_one(dict(item))
+
+    async def set_quantity(self, user_id, product_id, quantity):
+        result = await self.collection.update_one({"user_id": user_id, "product_id": product_id}, {"$set": {"quantity": quantity}})
+        return result.modified_count > 0
+
+    async def delete(self, user_id, product_id):
+        result = await self.collection.delete_one({"user_id": user_id, "product_id": product_id})
+        return result.deleted_count > 0
+
+    async def clear(self, user_id):
+        await self.collection.delete_many({"user_id": user_id})
+
+
+class MongoWishlistRepository(WishlistRepository):
+    def __init__(self, db):
+        self.collection = db.wishlist_items
+
+    async def list_for_user(self, user_id):
+        return await self.collection.find({"user_id": user_id}, {"_id": 0}).to_list(length=None)
+
+    async def find(self, user_id, product_id):
+        return await self.collection.find_one({"user_id": user_id, "product_id": product_id}, {"_id": 0})
+
+    async def insert(self, item):
+        await self.collection.insert_one(dict(item))
+
+    async def delete(self, user_id, product_id):
+        result = await self.collection.delete_one({"user_id": user_id, "product_id": product_id})
+        return result.deleted_count > 0
+
+
+class MongoOrderRepository(OrderRepository):
+    def __init__(self, db):
+        self.collection = db.orders
+        self.summaries = db.order_summaries
+
+    async def insert(self, order):
+        # Marked as it is written, so the history backfill below never counts it on top of record_in_summary
+        await self.collection.insert_one({**order, "in_summary": True})
+
+    async def page_for_user(self, user_id, limit, before=None, include_items=True):
+        filter_query = {"user_id": user_id}
+        if before:
+            created_at, order_id = before
+            filter_query["$or"] = [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "id": {"$lt": order_id}}]
+        projection = {"_id": 0, "in_summary": 0} if include_items else {"_id": 0, "in_summary": 0, "items": 0}
+        cursor = self.collection.find(filter_query, projection).sort([("created_at", -1), ("id", -1)]).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def get_summary(self, user_id):
+        from pymongo.errors import DuplicateKeyError
+
+        summary = await self.summaries.find_one({"user_id": user_id}, {"_id": 0})
+        if summary and summary.get("backfilled"):
+            return summary
+        # Orders placed before summaries existed were never counted. That set no longer grows, so its
+        # totals are added to whatever record_in_summary has counted since, once, by the first reader.
+        pipeline = [
+            {"$match": {"user_id": user_id, "in_summary": {"$ne": True}}},
+            {"$group": {"_id": None, "order_count": {"$sum": 1}, "lifetime_spend": {"$sum": "$total_amount"}, "last_order_at": {"$max": "$created_at"}}},
+        ]
+        totals = await self.collection.aggregate(pipeline).to_list(length=1)
+        history = totals[0] if totals and totals[0]["order_count"] else None
+        if not history and not summary:
+            return None
+        update = {"$set": {"backfilled": True}}
+        if history:
+            update["$inc"] = {"order_count": history["order_count"], "lifetime_spend": history["lifetime_spend"]}
+            update["$max"] = {"last_order_at": history["last_order_at"]}
+        try:
+            await self.summaries.update_one({"user_id": user_id, "backfilled": {"$ne": True}}, update, upsert=True)
+        except DuplicateKeyError:
+            # Another reader backfilled first; the unique user_id index stops a second summary
+            pass
+        return await self.summaries.find_one({"user_id": user_id}, {"_id": 0})
+
+    async def record_in_summary(self, user_id, amount, created_at):
+        await self.summaries.update_one(
+            {"user_id": user_id},
+            {"$inc": {"order_count": 1, "lifetime_spend": amount}, "$max": {"last_order_at": created_at}},
+            upsert=True,
+        )
+
+
+class MongoLeaseRepository(LeaseRepository):
+    def __init__(self, db):
+        self.collection = db.leases
+
+    async def acquire(self, name, owner, ttl):
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.now(timezone.utc)
+        try:
+            # Matches an expired or never-held lease; otherwise the upsert collides on _id.
+            # A lease held by this owner is not matched either: only renew extends it.
+            await self.collection.update_one(
+                {"_id": name, "$or": [{"expires_at": {"$lte": now}}, {"owner": None}]},
+                {"$set": {"owner": owner, "acquired_at": now, "expires_at": now + timedelta(seconds=ttl)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def renew(self, name, owner, ttl):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        result = await self.collection.update_one({"_id": name, "owner": owner}, {"$set": {"expires_at": expires_at}})
+        return result.matched_count > 0
+
+    async def release(self, name, owner, completed=False):
+        now = datetime.now(timezone.utc)
+        update = {"expires_at": now}
+        if completed:
+            update["completed_at"] = now
+        await self.collection.update_one({"_id": name, "owner": owner}, {"$set": update})
+
+    async def get(self, name):
+        return await self.collection.find_one({"_id": name})
+
+
+class MongoCatalogVersionRepository(CatalogVersionRepository):
+    DOCUMENT_ID = "catalog"
+
+    def __init__(self, db):
+        self.collection = db.catalog_versions
+
+    async def get(self):
+        return await self.collection.find_one({"_id": self.DOCUMENT_ID})
+
+    async def bump(self, *components):
+        from pymongo import ReturnDocument
+
+        now = datetime.now(timezone.utc)
+        increments = {"version": 1, **{f"components.{name}.version": 1 for name in components}}
+        updates = {"updated_at": now, **{f"components.{name}.updated_at": now for name in components}}
+        return await self.collection.find_one_and_update(
+            {"_id": self.DOCUMENT_ID},
+            {"$inc": increments, "$set": updates},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def get_validators(self, component):
+        document = await self.collection.find_one({"_id": f"{component}_validators"})
+        return {source.pop("url"): source for source in (document or {}).get("sources", [])}
+
+    async def save_validators(self, component, validators):
+        # Kept apart from the version document so saving them does not wake the change streams.
+        # URLs contain dots, so sources are stored as a list rather than keyed by URL.
+        sources = [{"url": url, **source} for url, source in validators.items()]
+        await self.collection.update_one(
+            {"_id": f"{component}_validators"},
+            {"$set": {"sources": sources, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+    async def watch(self):
+        # Change streams need a replica set; on a standalone server this raises and callers fall back to polling
+        pipeline = [{"$match": {"documentKey._id": self.DOCUMENT_ID}}]
+        async with self.collection.watch(pipeline, full_document="updateLookup") as stream:
+            yield None
+            async for change in stream:
+                if change.get("fullDocument"):
+                    yield change["fullDocument"]
+
+
+class MongoRepositories(Repositories):
+    def __init__(self, mongo_url: str, db_name: str):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.client = AsyncIOMotorClient(mongo_url)
+        self.db = self.client[db_name]
+        self.products = MongoProductRepository(self.db)
+        self.users = MongoUserRepository(self.db)
+        self.cart = MongoCartRepository(self.db)
+        self.wishlist = MongoWishlistRepository(self.db)
+        self.orders = MongoOrderRepository(self.db)
+        self.leases = MongoLeaseRepository(self.db)
+        self.catalog_versions = MongoCatalogVersionRepository(self.db)
+
+    async def ensure_indexes(self):
+        await self.db.products.create_index("id")
+        await self.db.users.create_index("id")
+        await self.db.users.create_index("email")
+        await self.db.cart_items.create_index([("user_id", 1), ("product_id", 1)])
+        await self.db.wishlist_items.create_index([("user_id", 1), ("product_id", 1)])
+        await self.db.orders.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])
+        await self.db.order_summaries.create_index("user_id", unique=True)
+
+    def close(self):
+        self.client.close()
+
+
+# In-memory backend
+def _get_path(document: dict, path: str):
+    for key in path.split("."):
+        document = (document or {}).get(key)
+    return document
+
+
+class InMemoryCatalogWriter(CatalogWriter):
+    def __init__(self, repository):
+        self.repository = repository
+        self.by_id = {}
+
+    async def write(self, products):
+        for product in products:
+            self.by_id.setdefault(product["id"], copy.deepcopy(product))
+
+    async def count(self):
+        return len(self.by_id)
+
+    async def commit(self):
+        self.repository.by_id = self.by_id
+
+    async def abort(self):
+        self.by_id = {}
+
+
+class InMemoryProductRepository(ProductRepository):
+    def __init__(self):
+        self.by_id = {}
+
+    async def get(self, product_id):
+        product = self.by_id.get(product_id)
+        return copy.deepcopy(product) if product else None
+
+    async def get_many(self, product_ids):
+        return [copy.deepcopy(self.by_id[pid]) for pid in product_ids if pid in self.by_id]
+
+    def _page(self, search, category, min_price, max_price, sort, skip, limit):
+        products = self.by_id.values()
+        if search:
+            pattern = re.compile(search, re.IGNORECASE)
+            products = [p for p in products if pattern.search(p.get("title", "")) or pattern.search(p.get("description", ""))]
+        if category:
+            pattern = re.compile(category, re.IGNORECASE)
+            products = [p for p in products if pattern.search(p.get("category", ""))]
+        if min_price is not None:
+            products = [p for p in products if p.get("price", 0) >= min_price]
+        if max_price is not None:
+            products = [p for p in products if p.get("price", 0) <= max_price]
+        products = list(products)
+        for field, direction in reversed(product_sort_criteria(sort)):
+            products.sort(key=lambda p: _get_path(p, field) or 0, reverse=direction < 0)
+        return len(products), products[skip:skip + limit]
+
+    async def list(self, search=None, category=None, min_price=None, max_price=None, sort=None, skip=0, limit=20):
+        total, products = self._page(search, category, min_price, max_price, sort, skip, limit)
+        return total, copy.deepcopy(products)
+
+    async def list_ids(self, search=None, category=None, min_price=None, max_price=None, sort=None, skip=0, limit=20):
+        total, products = self._page(search, category, min_price, max_price, sort, skip, limit)
+        return total, [product["id"] for product in products]
+
+    async def all(self):
+        return copy.deepcopy(list(self.by_id.values()))
+
+    async def stream(self, after_id=None, chunk_size=1000, fields=None):
+        ids = sorted(product_id for product_id in self.by_id if after_id is None or product_id > after_id)
+        for start in range(0, len(ids), chunk_size):
+            # The catalog may be replaced while a caller works through it
+            chunk = [self.by_id[product_id] for product_id in ids[start:start + chunk_size] if product_id in self.by_id]
+            if fields:
+                chunk = [{field: product[field] for field in fields if field in product} for product in chunk]
+            yield copy.deepcopy(chunk)
+
+    async def replace_all(self, products):
+        self.by_id = {product["id"]: copy.deepcopy(product) for product in products}
+        return len(products)
+
+    async def begin_replace(self):
+        return InMemoryCatalogWriter(self)
+
+
+class InMemoryUserRepository(UserRepository):
+    def __init__(self):
+        self.by_id = {}
+        self.by_email = {}
+
+    async def get(self, user_id):
+        user = self.by_id.get(user_id)
+        return copy.deepcopy(user) if user else None
+
+    async def get_by_email(self, email):
+        user = self.by_email.get(email)
+        return copy.deepcopy(user) if user else None
+
+    async def insert(self, user):
+        user = copy.deepcopy(user)
+        self.by_id[user["id"]] = user
+        self.by_email[user["email"]] = user
+
+
+class _InMemoryUserItems:
+    # Shared storage for cart and wishlist: user_id -> {product_id: item}
+    def __init__(self):
+        self.items = {}
+
+    async def list_for_user(self, user_id):
+        return copy.deepcopy(list(self.items.get(user_id, {}).values()))
+
+    async def find(self, user_id, product_id):
+        item = self.items.get(user_id, {}).get(product_id)
+        return copy.deepcopy(item) if item else None
+
+    async def insert(self, item):
+        self.items.setdefault(item["user_id"], {})[item["product_id"]] = copy.deepcopy(item)
+
+    async def delete(self, user_id, product_id):
+        return self.items.get(user_id, {}).pop(product_id, None) is not None
+
+
+class InMemoryCartRepository(_InMemoryUserItems, CartRepository):
+    async def set_quantity(self, user_id, product_id, quantity):
+        item = self.items.get(user_id, {}).get(product_id)
+        if item is None or item["quantity"] == quantity:
+            return False
+        item["quantity"] = quantity
+        return True
+
+    async def clear(self, user_id):
+        self.items.pop(user_id, None)
+
+
+class InMemoryWishlistRepository(_InMemoryUserItems, WishlistRepository):
+    pass
+
+
+class InMemoryOrderRepository(OrderRepository):
+    def __init__(self):
+        self.by_user = {}
+        self.summaries = {}
+
+    async def insert(self, order):
+        self.by_user.setdefault(order["user_id"], []).append({**copy.deepcopy(order), "in_summary": True})
+
+    async def page_for_user(self, user_id, limit, before=None, include_items=True):
+        orders = sorted(self.by_user.get(user_id, []), key=lambda o: (o["created_at"], o["id"]), reverse=True)
+        if before:
+            orders = [o for o in orders if (o["created_at"], o["id"]) < before]
+        page = copy.deepcopy(orders[:limit])
+        for order in page:
+            order.pop("in_summary", None)
+            if not include_items:
+                order.pop("items", None)
+        return page
+
+    def _add_to_summary(self, user_id, amount, created_at):
+        summary = self.summaries.setdefault(user_id, {"user_id": user_id, "order_count": 0, "lifetime_spend": 0.0, "last_order_at": None})
+        summary["order_count"] += 1
+        summary["lifetime_spend"] += amount
+        if summary["last_order_at"] is None or created_at > summary["last_order_at"]:
+            summary["last_order_at"] = created_at
+        return summary
+
+    async def get_summary(self, user_id):
+        summary = self.summaries.get(user_id)
+        if not summary or not summary.get("backfilled"):
+            history = [order for order in self.by_user.get(user_id, []) if not order.get("in_summary")]
+            for order in history:
+                summary = self._add_to_summary(user_id, order["total_amount"], order["created_at"])
+            if summary:
+                summary["backfilled"] = True
+        return dict(summary) if summary else None
+
+    async def record_in_summary(self, user_id, amount, created_at):
+        self._add_to_summary(user_id, amount, created_at)
+
+
+class InMemoryLeaseRepository(LeaseRepository):
+    def __init__(self):
+        self.leases = {}
+
+    async def acquire(self, name, owner, ttl):
+        now = datetime.now(timezone.utc)
+        lease = self.leases.setdefault(name, {"_id": name})
+        if lease.get("owner") is not None and lease["expires_at"] > now:
+            return False
+        lease.update(owner=owner, acquired_at=now, expires_at=now + timedelta(seconds=ttl))
+        return True
+
+    async def renew(self, name, owner, ttl):
+        lease = self.leases.get(name)
+        if not lease or lease.get("owner") != owner:
+            return False
+        lease["expires_at"] = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        return True
+
+    async def release(self, name, owner, completed=False):
+        lease = self.leases.get(name)
+        if lease and lease.get("owner") == owner:
+            lease["expires_at"] = datetime.now(timezone.utc)
+            if completed:
+                lease["completed_at"] = lease["expires_at"]
+
+    async def get(self, name):
+        lease = self.leases.get(name)
+        return dict(lease) if lease else None
+
+
+class InMemoryCatalogVersionRepository(CatalogVersionRepository):
+    def __init__(self):
+        self.document = None
+        self.validators = {}
+
+    async def get(self):
+        return copy.deepcopy(self.document)
+
+    async def bump(self, *components):
+        now = datetime.now(timezone.utc)
+        document = self.document or {"_id": "catalog", "version": 0, "components": {}}
+        document["version"] += 1
+        document["updated_at"] = now
+        for name in components:
+            version = document["components"].get(name, {}).get("version", 0) + 1
+            document["components"][name] = {"version": version, "updated_at": now}
+        self.document = document
+        return copy.deepcopy(document)
+
+    async def get_validators(self, component):
+        return copy.deepcopy(self.validators.get(component, {}))
+
+    async def save_validators(self, component, validators):
+        self.validators[component] = copy.deepcopy(validators)
+
+
+class InMemoryRepositories(Repositories):
+    def __init__(self):
+        self.products = InMemoryProductRepository()
+        self.users = InMemoryUserRepository()
+        self.cart = InMemoryCartRepository()
+        self.wishlist = InMemoryWishlistRepository()
+        self.orders = InMemoryOrderRepository()
+        self.leases = InMemoryLeaseRepository()
+        self.catalog_versions = InMemoryCatalogVersionRepository()
+
+
+def create_repositories(backend: str, mongo_url: str = None, db_name: str = None) -> Repositories:
+    if backend == "memory":
+        return InMemoryRepositories()
+    if backend == "mongo":
+        return MongoRepositories(mongo_url, db_name)
+    raise ValueError(f"Unknown repository backend: {backend}")
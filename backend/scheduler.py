@@ -0,0 +1,122 @@
+"""Leader-elected periodic jobs.
+
+Every worker runs a ``LeasedJob`` loop, but a run only happens on the
+worker holding the job's lease (see ``LeaseRepository``). The lease is
+renewed while the job runs, so a slow sync is not taken over, and it
+expires on its own if the worker dies. Only ``renew`` extends a lease, so
+a worker cannot win it again while it holds it, and overlapping runs on
+one worker (a forced run during a scheduled one) are refused in process
+before the lease is tried. A successful run is stamped with
+``completed_at``. Workers skip a run when the last one finished less than
+``min_interval`` ago, so workers booting at the same time do not repeat a
+fresh sync. Workers learn about a sync they did not run through the
+catalog version document (see ``catalog_version``), not through the lease.
+"""
+import asyncio
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timezone
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def aware_utc(value):
+    # Mongo returns naive UTC datetimes
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class LeaseHeld(Exception):
+    pass
+
+
+class LeasedJob:
+    def __init__(self, name, func, leases, interval: float, jitter: float = 0.1, lease_ttl: float = 300.0,
+                 min_interval: float = None, owner: str = None):
+        self.name = name
+        self.func = func
+        self.leases = leases
+        self.interval = interval
+        self.jitter = jitter
+        self.lease_ttl = lease_ttl
+        # Ticks on one worker are at least interval * (1 - jitter) apart, so the default only skips a run
+        # another worker finished since (e.g. all of them booting together); 10% covers clock differences
+        self.min_interval = interval * (1 - jitter) * 0.9 if min_interval is None else min_interval
+        self.owner = owner or worker_id()
+        self._running = False
+        self._task = None
+
+    def _next_delay(self):
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            if not await self.leases.renew(self.name, self.owner, self.lease_ttl):
+                print(f"Lost lease for job {self.name}")
+                return
+
+    async def _last_completed_at(self):
+        return aware_utc((await self.leases.get(self.name) or {}).get("completed_at"))
+
+    async def run_once(self, force: bool = False) -> bool:
+        """Run the job if this worker wins the lease; returns False when skipped.
+
+        Raises ``LeaseHeld`` when ``force`` is set and a run is already going, here or on another worker.
+        """
+        # Claimed before the first await, so two calls on this worker cannot both get past it
+        if self._running:
+            if force:
+                raise LeaseHeld(self.name)
+            return False
+        self._running = True
+        try:
+            return await self._run(force)
+        finally:
+            self._running = False
+
+    async def _run(self, force):
+        if not await self.leases.acquire(self.name, self.owner, self.lease_ttl):
+            if force:
+                raise LeaseHeld(self.name)
+            return False
+
+        completed = False
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            completed_at = await self._last_completed_at()
+            if not force and completed_at and (datetime.now(timezone.utc) - completed_at).total_seconds() < self.min_interval:
+                return False
+            completed = bool(await self.func())
+            return completed
+        finally:
+            heartbeat.cancel()
+            await self.leases.release(self.name, self.owner, completed=completed)
+
+    async def _loop(self, run_immediately):
+        delay = random.uniform(0, self.interval * self.jitter) if run_immediately else self._next_delay()
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Error running job {self.name}: {e}")
+            delay = self._next_delay()
+
+    def start(self, run_immediately: bool = True):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(run_immediately))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,72 @@
+"""Response serialization helpers.
+
+Responses are encoded with orjson. Product documents are serialized once
+into ``orjson.Fragment`` objects held by ``CatalogJSONCache`` and spliced
+into listing, cart and wishlist payloads as-is, so a product is not
+re-encoded on every request that embeds it. The catalog only changes on
+sync, which calls ``invalidate``.
+"""
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from repositories import ProductRepository
+
+
+def json_response(content, status_code: int = 200, headers: dict = None) -> ORJSONResponse:
+    """Return ``content`` straight through orjson, skipping FastAPI's jsonable_encoder pass."""
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
+
+
+class CatalogJSONCache:
+    def __init__(self, products: ProductRepository, max_entries: int = 200_000):
+        self.products = products
+        self.max_entries = max_entries
+        self._entries = {}
+        # Bumped by invalidate(), so reads that straddle a sync are not cached
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, product: dict):
+        entry = (product, orjson.Fragment(orjson.dumps(product)))
+        if len(self._entries) >= self.max_entries:
+            # Catalog-sized in practice; evict the oldest entry if it ever overflows
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[product["id"]] = entry
+        return entry
+
+    def prime(self, products):
+        for product in products:
+            self._store(product)
+
+    def invalidate(self):
+        self._entries = {}
+        self._generation += 1
+
+    async def entries(self, product_ids) -> dict:
+        """Map product id -> (product dict, JSON fragment); unknown ids are omitted."""
+        found, missing = {}, []
+        for product_id in product_ids:
+            entry = self._entries.get(product_id)
+            if entry is None:
+                missing.append(product_id)
+            else:
+                found[product_id] = entry
+        if missing:
+            generation = self._generation
+            products = await self.products.get_many(missing)
+            # A read that straddled a sync may predate it; serve it, but do not cache it
+            cacheable = generation == self._generation
+            for product in products:
+                found[product["id"]] = self._store(product) if cacheable else (product, orjson.Fragment(orjson.dumps(product)))
+        return found
+
+    async def fragments(self, product_ids) -> list:
+        """JSON fragments for ``product_ids`` in the given order, skipping unknown ids."""
+        entries = await self.entries(product_ids)
+        return [entries[product_id][1] for product_id in product_ids if product_id in entries]
+
+    async def fragment(self, product_id):
+        entry = (await self.entries([product_id])).get(product_id)
+        return entry[1] if entry else None
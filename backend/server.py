@@ -1,24 +1,37 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request, status
+from fastapi.responses import PlainTextResponse, Response, ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.middleware.gzip import GZipMiddleware
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from uuid import uuid4
+import uuid
 from datetime import datetime, timezone
-import httpx
 import asyncio
 from jose import JWTError, jwt
 import bcrypt
 import json
+import base64
 from sentence_transformers import SentenceTransformer
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 import pickle
+from repositories import create_repositories
+from metrics import registry as metrics_registry, timed, instrument_repositories, MetricsMiddleware, PROMETHEUS_CONTENT_TYPE
+from profiling import RequestProfiler, ProfilingMiddleware, to_thread_profiled
+from serialization import CatalogJSONCache, json_response
+from http_cache import CatalogHTTPCache
+from ingestion import CatalogIngestor
+from admission import AdmissionController, AdmissionRejected
+from singleflight import SingleFlight
+from scheduler import LeasedJob, LeaseHeld
+from catalog_version import CatalogVersionWatcher
+from suggest import SuggestIndexCache
+from embedding_index import EmbeddingIndex, EMBEDDING_INDEX_PATH, MODEL_NAME, PRODUCT_FIELDS, product_text
 # from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 
@@ -29,10 +42,46 @@ from email.message import EmailMessage
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Data access: "mongo" (default) or "memory" for offline benchmarking
+REPOSITORY_BACKEND = os.environ.get('REPOSITORY_BACKEND', 'mongo')
+repos = instrument_repositories(create_repositories(REPOSITORY_BACKEND, os.environ.get('MONGO_URL'), os.environ.get('DB_NAME')))
+# Pre-serialized product JSON, rebuilt lazily after each catalog sync
+catalog_json = CatalogJSONCache(repos.products)
+# Catalog ETag/Last-Modified state, following the shared products version
+catalog_http = CatalogHTTPCache()
+# Typeahead prefix index over titles and categories, rebuilt when the catalog changes.
+# Its ETags follow the index being served, which lags the catalog while a rebuild runs.
+suggest_index = SuggestIndexCache(repos.products)
+suggest_http = CatalogHTTPCache()
+SUGGEST_LIMIT_MAX = 20
+
+# Upstream catalog fetcher with a pooled HTTP client and conditional requests
+catalog_ingestor = CatalogIngestor.from_env()
+
+# Follows the shared catalog version so caches on every worker are dropped after a sync on any one of them
+catalog_version = CatalogVersionWatcher.from_env(repos.catalog_versions)
+
+def on_products_changed(state):
+    catalog_json.invalidate()
+    # The shared version keeps ETags identical across workers
+    catalog_http.bump(version=state["version"], updated_at=state["updated_at"])
+
+async def rebuild_suggest_index(state):
+    index = await suggest_index.rebuild()
+    # Only once the new index is serving, so a new ETag never labels old suggestions
+    suggest_http.bump(version=state["version"], updated_at=state["updated_at"])
+    print(f"Suggest index rebuilt with {len(index)} products")
+
+def load_embedding_index(state=None):
+    global embedding_index
+    embedding_index = EmbeddingIndex.load(EMBEDDING_INDEX_PATH)
+    if embedding_index is not None:
+        print(f"Loaded embedding index with {len(embedding_index)} products")
+
+catalog_version.on_change("products", on_products_changed)
+catalog_version.on_change("products", rebuild_suggest_index)
+# A finished build_embeddings.py run bumps "embeddings"; products changes leave the index alone
+catalog_version.on_change("embeddings", load_embedding_index)
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key')
@@ -40,35 +89,91 @@ JWT_ALGORITHM = "HS256"
 
 # Security
 security = HTTPBearer()
+# When set, admin routes require a matching X-Admin-Token header; profiling routes are disabled without it
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Opt-in request profiling, switchable at runtime through /api/admin/profiling
+profiler = RequestProfiler.from_env()
 
 # Create the main app without a prefix
-app = FastAPI(title="AI Shopping Backend", version="1.0.0")
+app = FastAPI(title="AI Shopping Backend", version="1.0.0", default_response_class=ORJSONResponse)
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # AI Configuration
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 model = None
-embeddings_cache = {}
+# Precomputed product vectors from build_embeddings.py; without one, products are encoded per query
+embedding_index = None
+# (index, products version, EmbeddingIndex or None) for products the index has no vector for yet
+index_gap = None
+index_gap_flight = SingleFlight("embedding_gap")
+
+# Admission control for /api/ai/query so bursts of AI queries cannot starve cart and checkout
+ai_admission = AdmissionController(
+    "ai_query",
+    max_concurrency=int(os.environ.get('AI_MAX_CONCURRENCY', '2')),
+    max_queue=int(os.environ.get('AI_MAX_QUEUE', '16')),
+    queue_timeout=float(os.environ.get('AI_QUEUE_TIMEOUT', '5')),
+    rate=float(os.environ.get('AI_RATE_PER_USER', '1')),
+    burst=float(os.environ.get('AI_BURST_PER_USER', '5')),
+)
+
+# Identical concurrent reads share one backend execution
+product_flight = SingleFlight("product")
+listing_flight = SingleFlight("product_listing")
+ai_search_flight = SingleFlight("ai_search")
 
 # Initialize sentence transformer model
 def init_ai_model():
     global model
     try:
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        model = SentenceTransformer(MODEL_NAME)
         print("AI model loaded successfully")
     except Exception as e:
         print(f"Error loading AI model: {e}")
 
+async def ensure_indexes():
+    try:
+        await repos.ensure_indexes()
+    except Exception as e:
+        print(f"Error creating indexes: {e}")
+
+# Set SYNC_PRODUCTS_ON_STARTUP=false when the catalog is seeded some other way (e.g. benchmarks)
+SYNC_PRODUCTS_ON_STARTUP = os.environ.get('SYNC_PRODUCTS_ON_STARTUP', 'true').lower() == 'true'
+# Periodic catalog refresh; one worker at a time holds the sync lease. 0 disables the schedule.
+CATALOG_SYNC_INTERVAL = float(os.environ.get('CATALOG_SYNC_INTERVAL', '3600'))
+CATALOG_SYNC_JITTER = float(os.environ.get('CATALOG_SYNC_JITTER', '0.1'))
+CATALOG_SYNC_LEASE_TTL = float(os.environ.get('CATALOG_SYNC_LEASE_TTL', '300'))
+
 # Initialize AI on startup
 @app.on_event("startup")
 async def startup_event():
-    await sync_products_from_api()
+    await ensure_indexes()
+    try:
+        await catalog_version.refresh()
+    except Exception as e:
+        print(f"Error reading catalog version: {e}")
+    if SYNC_PRODUCTS_ON_STARTUP:
+        # Only the worker that wins the lease syncs; the rest skip a sync that is already fresh
+        try:
+            await catalog_sync_job.run_once()
+        except Exception as e:
+            print(f"Error running startup sync: {e}")
     init_ai_model()
+    if embedding_index is None:
+        load_embedding_index()
+    catalog_version.start()
+    if CATALOG_SYNC_INTERVAL > 0:
+        catalog_sync_job.start(run_immediately=False)
 
 # Models
 class User(BaseModel):
@@ -143,6 +248,12 @@ class OrderCreate(BaseModel):
     items: List[dict]
     shipping_address: dict
 
+class OrderSummary(BaseModel):
+    user_id: str
+    order_count: int = 0
+    lifetime_spend: float = 0.0
+    last_order_at: Optional[datetime] = None
+
 class AIQueryRequest(BaseModel):
     query: str
     limit: int = 10
@@ -157,6 +268,12 @@ class ContactFormRequest(BaseModel):
     email: str
     message: str
 
+class ProfilingConfigUpdate(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = None
+    slow_threshold_ms: Optional[float] = None
+    max_profiles: Optional[int] = None
+
 # Utility functions
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -176,7 +293,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        user = await db.users.find_one({"id": user_id})
+        user = await repos.users.get(user_id)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         
@@ -184,79 +301,154 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-# Sync products from Fake Store API
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    # Fails closed: profiling slows every request and its captures expose internals
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to use this route")
+    await require_admin(x_admin_token)
+
+# Order history cursors are opaque "<created_at iso>|<order id>" strings, base64 encoded
+ORDERS_PAGE_MAX = 100
+
+def encode_order_cursor(order: dict) -> str:
+    raw = f"{order['created_at'].isoformat()}|{order['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_order_cursor(cursor: str):
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split("|", 1)
+        return datetime.fromisoformat(created_at), order_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Sync products from the upstream catalog (Fake Store API by default)
 async def sync_products_from_api():
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://fakestoreapi.com/products")
-            if response.status_code == 200:
-                products = response.json()
-                
-                # Clear existing products
-                await db.products.delete_many({})
-                
-                # Insert new products
-                for product in products:
-                    await db.products.insert_one(product)
-                
-                print(f"Synced {len(products)} products from API")
-                return True
-            else:
-                print(f"Failed to fetch products: {response.status_code}")
-                return False
+        # Validators are shared, so whichever worker wins the lease sends conditional requests
+        catalog_ingestor.validators = await repos.catalog_versions.get_validators("products")
+        result = await catalog_ingestor.sync(repos.products)
+        if result.changed:
+            await catalog_version.publish("products")
+            # Saved after the publish: if that fails, the next sync downloads and publishes again
+            await repos.catalog_versions.save_validators("products", catalog_ingestor.validators)
+            print(f"Synced {result.count} products from API ({result.requests} requests)")
+        else:
+            print(f"Upstream catalog unchanged ({result.requests} requests)")
+        return True
     except Exception as e:
         print(f"Error syncing products: {e}")
         return False
 
+catalog_sync_job = LeasedJob(
+    "catalog_sync",
+    sync_products_from_api,
+    repos.leases,
+    interval=CATALOG_SYNC_INTERVAL or 3600,
+    jitter=CATALOG_SYNC_JITTER,
+    lease_ttl=CATALOG_SYNC_LEASE_TTL,
+)
+
 # AI Functions
 def get_product_embeddings(products):
     if not model:
         return []
     
-    texts = []
-    for product in products:
-        # Combine title, description, and category for embedding
-        text = f"{product.get('title', '')} {product.get('description', '')} {product.get('category', '')}"
-        texts.append(text)
+    texts = [product_text(product) for product in products]
     
-    embeddings = model.encode(texts)
+    with timed("ai", "encode_products"):
+        embeddings = model.encode(texts)
     return embeddings
 
+def _search_index(index, query: str, limit: int, gap=None):
+    with timed("ai", "encode_query"):
+        query_embedding = model.encode([query], normalize_embeddings=True)[0]
+    with timed("ai", "similarity"):
+        matches = index.search(query_embedding, limit)
+        if gap is not None:
+            matches = sorted(matches + gap.search(query_embedding, limit), key=lambda match: match[1], reverse=True)[:limit]
+        return matches
+
+def _encode_gap(index, products):
+    with timed("ai", "encode_products"):
+        vectors = model.encode([product_text(product) for product in products], normalize_embeddings=True)
+    ids = np.array([product["id"] for product in products], dtype=np.int64)
+    return EmbeddingIndex(index.manifest, ids, np.asarray(vectors, dtype=np.float32))
+
+async def load_index_gap(index, products_version):
+    """Vectors for products added after ``index`` was built, encoded once per products version."""
+    global index_gap
+    if index_gap is not None and index_gap[0] is index and index_gap[1] == products_version:
+        return index_gap[2]
+    indexed = set(index.ids.tolist())
+    missing = []
+    async for chunk in repos.products.stream(fields=PRODUCT_FIELDS):
+        missing.extend(product for product in chunk if product["id"] not in indexed)
+    gap = await to_thread_profiled(_encode_gap, index, missing) if missing else None
+    index_gap = (index, products_version, gap)
+    if missing:
+        print(f"Encoded {len(missing)} products missing from the embedding index")
+    return gap
+
+def _search_products(products, query: str, limit: int):
+    # Get or create embeddings
+    product_embeddings = get_product_embeddings(products)
+    if len(product_embeddings) == 0:
+        return []
+    
+    # Encode query
+    with timed("ai", "encode_query"):
+        query_embedding = model.encode([query])
+    
+    # Calculate similarities
+    with timed("ai", "similarity"):
+        similarities = cosine_similarity(query_embedding, product_embeddings)[0]
+    
+    # Get top results
+    with timed("ai", "top_k"):
+        top_indices = np.argsort(similarities)[::-1][:limit]
+    return [(products[idx], float(similarities[idx])) for idx in top_indices]
+
 async def semantic_search(query: str, limit: int = 10):
     try:
         if not model:
             raise Exception("AI model not initialized")
         
-        # Get all products
-        products = await db.products.find().to_list(length=None)
-        if not products:
-            return []
-        
-        # Get or create embeddings
-        product_embeddings = get_product_embeddings(products)
-        if len(product_embeddings) == 0:
-            return []
-        
-        # Encode query
-        query_embedding = model.encode([query])
-        
-        # Calculate similarities
-        similarities = cosine_similarity(query_embedding, product_embeddings)[0]
-        
-        # Get top results
-        top_indices = np.argsort(similarities)[::-1][:limit]
+        # Encoding and scoring are CPU-bound; run them in a thread so the event loop keeps serving
+        # other requests (and profiled there too). Admission control bounds how many run at once.
+        index = embedding_index
+        if index is not None:
+            # Score against the prebuilt index; only the matches are read from the catalog.
+            # Products added since it was built are encoded once and scored alongside it until
+            # the next build lands; products edited since then keep their old vectors.
+            gap = None
+            products_version = catalog_version.components.get("products", {}).get("version")
+            if index.products_version != products_version:
+                gap = await index_gap_flight.do((id(index), products_version), lambda: load_index_gap(index, products_version))
+            matches = await to_thread_profiled(_search_index, index, query, limit, gap)
+            entries = await catalog_json.entries([product_id for product_id, _ in matches])
+            # Products removed since the index was built are skipped
+            scored = [(entries[product_id][0], score) for product_id, score in matches if product_id in entries]
+        else:
+            # Get all products
+            products = await repos.products.all()
+            if not products:
+                return []
+            scored = await to_thread_profiled(_search_products, products, query, limit)
         
         results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.1:  # Minimum threshold
-                product = products[idx]
+        for product, score in scored:
+            if score > 0.1:  # Minimum threshold
                 results.append({
                     "product_id": product["id"],
                     "title": product["title"],
                     "price": product["price"],
                     "image": product["image"],
                     "category": product["category"],
-                    "score": float(similarities[idx]),
+                    "score": score,
                     "summary": f"Found {product['title']} in {product['category']} category for ${product['price']}"
                 })
         
@@ -307,18 +499,18 @@ async def generate_ai_response(query: str, search_results: List[dict]):
 # Authentication Routes
 @api_router.post("/auth/register", response_model=dict)
 async def register(user_data: UserCreate):
-    existing_user = await db.users.find_one({"email": user_data.email})
+    existing_user = await repos.users.get_by_email(user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     hashed_password = hash_password(user_data.password)
     user = User(name=user_data.name, email=user_data.email, password_hash=hashed_password)
-    await db.users.insert_one(user.dict())
+    await repos.users.insert(user.dict())
     access_token = create_access_token(data={"sub": user.id})
     return {"user": UserResponse(**user.dict()), "access_token": access_token, "token_type": "bearer"}
 
 @api_router.post("/auth/login", response_model=dict)
 async def login(user_data: UserLogin):
-    user = await db.users.find_one({"email": user_data.email})
+    user = await repos.users.get_by_email(user_data.email)
     if not user or not verify_password(user_data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     access_token = create_access_token(data={"sub": user["id"]})
@@ -375,146 +567,217 @@ async def handle_contact_form(form_data: ContactFormRequest):
 
 # Product Routes
 @api_router.get("/products", response_model=dict)
-async def get_products(page: int = 1, limit: int = 20, search: str = None, category: str = None, min_price: float = None, max_price: float = None, sort: str = None):
+async def get_products(request: Request, page: int = 1, limit: int = 20, search: str = None, category: str = None, min_price: float = None, max_price: float = None, sort: str = None):
+    cache_headers, not_modified = catalog_http.check(request, "products")
+    if not_modified:
+        return not_modified
     skip = (page - 1) * limit
-    filter_query = {}
-    if search:
-        filter_query["$or"] = [{"title": {"$regex": search, "$options": "i"}}, {"description": {"$regex": search, "$options": "i"}}]
-    if category:
-        filter_query["category"] = {"$regex": category, "$options": "i"}
-    if min_price is not None or max_price is not None:
-        price_filter = {}
-        if min_price is not None: price_filter["$gte"] = min_price
-        if max_price is not None: price_filter["$lte"] = max_price
-        filter_query["price"] = price_filter
-    total = await db.products.count_documents(filter_query)
-    sort_criteria = [("price", 1)] if sort == "price_asc" else [("price", -1)] if sort == "price_desc" else [("rating.rate", -1)] if sort == "rating" else [("id", 1)]
-    products = await db.products.find(filter_query).sort(sort_criteria).skip(skip).limit(limit).to_list(length=limit)
-    for product in products:
-        if '_id' in product: del product['_id']
-    return {"data": products, "total": total, "page": page, "limit": limit, "pages": (total + limit - 1) // limit}
+
+    async def load_page():
+        total, product_ids = await repos.products.list_ids(search=search, category=category, min_price=min_price, max_price=max_price, sort=sort, skip=skip, limit=limit)
+        return total, await catalog_json.fragments(product_ids)
+
+    key = (catalog_http.version, search, category, min_price, max_price, sort, skip, limit)
+    total, products = await listing_flight.do(key, load_page)
+    return json_response({"data": products, "total": total, "page": page, "limit": limit, "pages": (total + limit - 1) // limit}, headers=cache_headers)
+
+# Declared before /products/{product_id} so "suggest" is not read as an id
+@api_router.get("/products/suggest", response_model=dict)
+async def suggest_products(request: Request, q: str = "", limit: int = 8):
+    cache_headers, not_modified = suggest_http.check(request, "suggest")
+    if not_modified:
+        return not_modified
+    index = await suggest_index.get()
+    with timed("suggest", "lookup"):
+        suggestions = index.suggest(q, max(1, min(limit, SUGGEST_LIMIT_MAX)))
+    return json_response({"query": q, **suggestions}, headers=cache_headers)
 
 @api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: int):
-    product = await db.products.find_one({"id": product_id})
+async def get_product(product_id: int, request: Request):
+    cache_headers, not_modified = catalog_http.check(request, "product")
+    if not_modified:
+        return not_modified
+    product = await product_flight.do((catalog_http.version, product_id), lambda: catalog_json.fragment(product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    if '_id' in product: del product['_id']
-    return Product(**product)
+    return json_response(product, headers=cache_headers)
 
 # --- Cart, Wishlist, Orders, AI, Admin, and Test Routes are all unchanged ---
 
 # Cart Routes
 @api_router.get("/cart", response_model=dict)
 async def get_cart(current_user: User = Depends(get_current_user)):
-    cart_items = await db.cart_items.find({"user_id": current_user.id}).to_list(length=None)
+    cart_items = await repos.cart.list_for_user(current_user.id)
+    products = await catalog_json.entries([item["product_id"] for item in cart_items])
     items, subtotal = [], 0
     for cart_item in cart_items:
-        product = await db.products.find_one({"id": cart_item["product_id"]})
-        if product:
-            if '_id' in product: del product['_id']
+        if cart_item["product_id"] in products:
+            product, product_json = products[cart_item["product_id"]]
             item_total = product["price"] * cart_item["quantity"]
-            items.append({"id": cart_item["id"], "product": product, "quantity": cart_item["quantity"], "item_total": item_total})
+            items.append({"id": cart_item["id"], "product": product_json, "quantity": cart_item["quantity"], "item_total": item_total})
             subtotal += item_total
-    return {"items": items, "subtotal": subtotal}
+    return json_response({"items": items, "subtotal": subtotal})
 
 @api_router.post("/cart", response_model=dict)
 async def add_to_cart(item_data: CartItemCreate, current_user: User = Depends(get_current_user)):
-    product = await db.products.find_one({"id": item_data.product_id})
+    product = await repos.products.get(item_data.product_id)
     if not product: raise HTTPException(status_code=404, detail="Product not found")
-    existing_item = await db.cart_items.find_one({"user_id": current_user.id, "product_id": item_data.product_id})
+    existing_item = await repos.cart.find(current_user.id, item_data.product_id)
     if existing_item:
         new_quantity = existing_item["quantity"] + item_data.quantity
-        await db.cart_items.update_one({"_id": existing_item["_id"]}, {"$set": {"quantity": new_quantity}})
+        await repos.cart.set_quantity(current_user.id, item_data.product_id, new_quantity)
     else:
         cart_item = CartItem(user_id=current_user.id, product_id=item_data.product_id, quantity=item_data.quantity)
-        await db.cart_items.insert_one(cart_item.dict())
+        await repos.cart.insert(cart_item.dict())
     return {"message": "Item added to cart"}
 
 @api_router.put("/cart", response_model=dict)
 async def update_cart_item(item_data: CartItemUpdate, current_user: User = Depends(get_current_user)):
-    result = await db.cart_items.update_one({"user_id": current_user.id, "product_id": item_data.product_id}, {"$set": {"quantity": item_data.quantity}})
-    if result.modified_count == 0: raise HTTPException(status_code=404, detail="Cart item not found")
+    updated = await repos.cart.set_quantity(current_user.id, item_data.product_id, item_data.quantity)
+    if not updated: raise HTTPException(status_code=404, detail="Cart item not found")
     return {"message": "Cart updated"}
 
 @api_router.delete("/cart/{product_id}", response_model=dict)
 async def remove_from_cart(product_id: int, current_user: User = Depends(get_current_user)):
-    result = await db.cart_items.delete_one({"user_id": current_user.id, "product_id": product_id})
-    if result.deleted_count == 0: raise HTTPException(status_code=404, detail="Cart item not found")
+    removed = await repos.cart.delete(current_user.id, product_id)
+    if not removed: raise HTTPException(status_code=404, detail="Cart item not found")
     return {"message": "Item removed from cart"}
 
 # Wishlist Routes
 @api_router.get("/wishlist", response_model=dict)
 async def get_wishlist(current_user: User = Depends(get_current_user)):
-    wishlist_items = await db.wishlist_items.find({"user_id": current_user.id}).to_list(length=None)
+    wishlist_items = await repos.wishlist.list_for_user(current_user.id)
+    products = await catalog_json.entries([item["product_id"] for item in wishlist_items])
     items = []
     for wishlist_item in wishlist_items:
-        product = await db.products.find_one({"id": wishlist_item["product_id"]})
-        if product:
-            if '_id' in product: del product['_id']
-            items.append({"id": wishlist_item["id"], "product": product, "added_at": wishlist_item["added_at"]})
-    return {"items": items}
+        if wishlist_item["product_id"] in products:
+            items.append({"id": wishlist_item["id"], "product": products[wishlist_item["product_id"]][1], "added_at": wishlist_item["added_at"]})
+    return json_response({"items": items})
 
 @api_router.post("/wishlist", response_model=dict)
 async def add_to_wishlist(item_data: WishlistItemCreate, current_user: User = Depends(get_current_user)):
-    product = await db.products.find_one({"id": item_data.product_id})
+    product = await repos.products.get(item_data.product_id)
     if not product: raise HTTPException(status_code=404, detail="Product not found")
-    existing_item = await db.wishlist_items.find_one({"user_id": current_user.id, "product_id": item_data.product_id})
+    existing_item = await repos.wishlist.find(current_user.id, item_data.product_id)
     if existing_item: return {"message": "Item already in wishlist"}
     wishlist_item = WishlistItem(user_id=current_user.id, product_id=item_data.product_id)
-    await db.wishlist_items.insert_one(wishlist_item.dict())
+    await repos.wishlist.insert(wishlist_item.dict())
     return {"message": "Item added to wishlist"}
 
 @api_router.delete("/wishlist/{product_id}", response_model=dict)
 async def remove_from_wishlist(product_id: int, current_user: User = Depends(get_current_user)):
-    result = await db.wishlist_items.delete_one({"user_id": current_user.id, "product_id": product_id})
-    if result.deleted_count == 0: raise HTTPException(status_code=404, detail="Wishlist item not found")
+    removed = await repos.wishlist.delete(current_user.id, product_id)
+    if not removed: raise HTTPException(status_code=404, detail="Wishlist item not found")
     return {"message": "Item removed from wishlist"}
 
 # Orders Routes
 @api_router.post("/orders/checkout", response_model=dict)
 async def create_order(order_data: OrderCreate, current_user: User = Depends(get_current_user)):
-    cart_items = await db.cart_items.find({"user_id": current_user.id}).to_list(length=None)
+    cart_items = await repos.cart.list_for_user(current_user.id)
     if not cart_items: raise HTTPException(status_code=400, detail="Cart is empty")
+    products = {p["id"]: p for p in await repos.products.get_many([item["product_id"] for item in cart_items])}
     order_items, total_amount = [], 0
     for cart_item in cart_items:
-        product = await db.products.find_one({"id": cart_item["product_id"]})
+        product = products.get(cart_item["product_id"])
         if product:
             item_total = product["price"] * cart_item["quantity"]
             order_items.append({"product_id": cart_item["product_id"], "title": product["title"], "price": product["price"], "quantity": cart_item["quantity"], "item_total": item_total})
             total_amount += item_total
     order = Order(user_id=current_user.id, items=order_items, total_amount=total_amount, shipping_address=order_data.shipping_address)
-    await db.orders.insert_one(order.dict())
-    await db.cart_items.delete_many({"user_id": current_user.id})
+    await repos.orders.insert(order.dict())
+    await repos.cart.clear(current_user.id)
+    # Keep the per-user summary current so the profile page never scans order history
+    await repos.orders.record_in_summary(current_user.id, total_amount, order.created_at)
     return {"order": order.dict(), "message": "Order placed successfully"}
 
 @api_router.get("/orders", response_model=dict)
-async def get_orders(current_user: User = Depends(get_current_user)):
-    orders = await db.orders.find({"user_id": current_user.id}).sort([("created_at", -1)]).to_list(length=None)
-    for order in orders:
-        if '_id' in order: del order['_id']
-    return {"orders": orders}
+async def get_orders(limit: int = 20, cursor: str = None, include_items: bool = True, current_user: User = Depends(get_current_user)):
+    limit = max(1, min(limit, ORDERS_PAGE_MAX))
+    before = decode_order_cursor(cursor) if cursor else None
+    # Fetch one extra document to know whether another page exists
+    orders = await repos.orders.page_for_user(current_user.id, limit + 1, before=before, include_items=include_items)
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    next_cursor = encode_order_cursor(orders[-1]) if has_more else None
+    return json_response({"orders": orders, "next_cursor": next_cursor, "has_more": has_more})
+
+@api_router.get("/orders/summary", response_model=dict)
+async def get_order_summary(current_user: User = Depends(get_current_user)):
+    summary = await repos.orders.get_summary(current_user.id)
+    return OrderSummary(**(summary or {"user_id": current_user.id})).dict()
 
 # AI Routes
 @api_router.post("/ai/query", response_model=AIQueryResponse)
 async def ai_query(query_data: AIQueryRequest, current_user: User = Depends(get_current_user)):
+    # Rejections (429/503 with Retry-After) are raised before any model work
+    ai_admission.check_rate(current_user.id)
+
+    async def admitted_search():
+        async with ai_admission.admit():
+            return await semantic_search(query_data.query, query_data.limit)
+
     try:
-        search_results = await semantic_search(query_data.query, query_data.limit)
+        # Identical in-flight queries wait on one admitted search instead of each taking a slot
+        search_results = await ai_search_flight.do((catalog_http.version, query_data.query, query_data.limit), admitted_search)
         reply_text = await generate_ai_response(query_data.query, search_results)
         return AIQueryResponse(reply_text=reply_text, results=search_results)
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"Error in AI query: {e}")
         return AIQueryResponse(reply_text="I'm sorry, I'm having trouble processing your request right now.", results=[])
 
 # Admin Routes
-@api_router.post("/admin/sync-products", response_model=dict)
+@api_router.post("/admin/sync-products", response_model=dict, dependencies=[Depends(require_admin)])
 async def sync_products():
-    success = await sync_products_from_api()
+    try:
+        success = await catalog_sync_job.run_once(force=True)
+    except LeaseHeld:
+        raise HTTPException(status_code=409, detail="A catalog sync is already running")
     if success:
         return {"message": "Products synced successfully"}
     else:
         raise HTTPException(status_code=500, detail="Failed to sync products")
 
+@api_router.get("/admin/stats", response_model=dict, dependencies=[Depends(require_admin)])
+async def get_admin_stats():
+    return {
+        "ai_admission": ai_admission.stats(),
+        "singleflight": {flight.group: flight.stats() for flight in (product_flight, listing_flight, ai_search_flight, index_gap_flight)},
+        "catalog_version": catalog_version.stats(),
+        "embedding_index": {
+            "products": len(embedding_index),
+            "products_version": embedding_index.products_version,
+            "stale": embedding_index.products_version != catalog_version.components.get("products", {}).get("version"),
+            "unindexed_products": len(index_gap[2]) if index_gap and index_gap[0] is embedding_index and index_gap[2] else 0,
+        } if embedding_index is not None else None,
+    }
+
+@api_router.get("/admin/profiling", response_model=dict, dependencies=[Depends(require_admin_token)])
+async def get_profiling():
+    return {"config": profiler.config(), "profiles": profiler.list_profiles()}
+
+@api_router.put("/admin/profiling", response_model=dict, dependencies=[Depends(require_admin_token)])
+async def update_profiling(config: ProfilingConfigUpdate):
+    profiler.configure(**config.dict())
+    return {"config": profiler.config()}
+
+@api_router.delete("/admin/profiling", response_model=dict, dependencies=[Depends(require_admin_token)])
+async def clear_profiling():
+    profiler.clear()
+    return {"message": "Profiles cleared"}
+
+@api_router.get("/admin/profiling/{profile_id}", dependencies=[Depends(require_admin_token)])
+async def download_profile(profile_id: int, format: str = "text", sort: str = "cumulative"):
+    entry = profiler.get(profile_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        # Loadable with pstats.Stats(path) or snakeviz
+        return Response(entry["stats"], media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.pstats"'})
+    return PlainTextResponse(profiler.render_text(entry, sort=sort))
+
 # Test Routes
 @api_router.get("/")
 async def root():
@@ -534,12 +797,18 @@ async def home():
     }
 app.include_router(api_router)
 
+# Compress large listings; small bodies are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
 # Configure logging
@@ -551,7 +820,10 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    await catalog_sync_job.stop()
+    await catalog_version.stop()
+    await catalog_ingestor.close()
+    repos.close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,54 @@
+"""Request coalescing for identical concurrent reads.
+
+``SingleFlight.do(key, fn)`` runs ``fn`` once per key at a time: callers
+that arrive while a call for the same key is in flight wait for it and
+get the same result (or exception). The shared result must be treated as
+read-only. The call runs in its own task, so a leader whose client
+disconnects does not cancel it for the other waiters.
+"""
+import asyncio
+
+from metrics import registry
+
+SINGLEFLIGHT_CALLS = registry.counter("singleflight_calls_total", "Coalesced reads by outcome (executed or merged).", ("group", "outcome"))
+SINGLEFLIGHT_MERGE_RATIO = registry.gauge("singleflight_merge_ratio", "Share of calls served by another caller's execution.", ("group",))
+
+
+def _consume_result(task):
+    # Keeps "exception was never retrieved" quiet when every waiter has gone away
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    def __init__(self, group: str):
+        self.group = group
+        self.executed = 0
+        self.merged = 0
+        self._calls = {}
+
+    @property
+    def merge_ratio(self) -> float:
+        total = self.executed + self.merged
+        return self.merged / total if total else 0.0
+
+    def stats(self):
+        return {"executed": self.executed, "merged": self.merged, "merge_ratio": round(self.merge_ratio, 4), "in_flight": len(self._calls)}
+
+    def _record(self, outcome):
+        SINGLEFLIGHT_CALLS.inc(group=self.group, outcome=outcome)
+        SINGLEFLIGHT_MERGE_RATIO.set(self.merge_ratio, group=self.group)
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is not None:
+            self.merged += 1
+            self._record("merged")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            task.add_done_callback(_consume_result)
+            self.executed += 1
+            self._record("executed")
+        return await asyncio.shield(task)
@@ -0,0 +1,201 @@
+"""Typeahead suggestions from an in-memory prefix index.
+
+``SuggestIndex`` is built once per catalog version from product titles and
+categories. Products are ranked up front (rating, then review count), each
+distinct word keeps a posting list of product ranks in ascending order, and
+the words are kept sorted, so a prefix resolves to a contiguous slice of
+them with two bisects. Short prefixes match thousands of words, too many to
+merge per keystroke, so every product a short prefix matches is stored at
+build time as one sorted rank array. Every word of a query must prefix a
+word of the product; the most selective one drives the lookup and the rest
+filter, short ones with vectorized lookups in their rank arrays.
+"""
+import asyncio
+import heapq
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+from repositories import ProductRepository
+
+WORD_RE = re.compile(r"[^\W_]+")
+# Prefixes up to this length get the ranks of every product they match precomputed
+CACHED_PREFIX_LENGTH = 3
+# Upper bound on candidates examined when a longer prefix drives a multi-word query
+MAX_SCAN = 5000
+# Driver candidates are filtered in chunks that start at this many per result and grow
+CHUNK_PER_RESULT = 4
+NO_RANKS = np.empty(0, dtype=np.int32)
+
+
+def _words(text):
+    # "men's" indexes as "mens" rather than "men" and "s"
+    return WORD_RE.findall((text or "").lower().replace("'", ""))
+
+
+def _unique(ranks):
+    # Merged postings repeat a product once per matching word, next to itself
+    last = None
+    for rank in ranks:
+        if rank != last:
+            yield rank
+            last = rank
+
+
+def _has_prefix(sorted_words, prefix):
+    index = bisect_left(sorted_words, prefix)
+    return index < len(sorted_words) and sorted_words[index].startswith(prefix)
+
+
+def _contains(sorted_ranks, ranks):
+    """Mask of the ``ranks`` that appear in ``sorted_ranks``."""
+    if not len(sorted_ranks):
+        return np.zeros(len(ranks), dtype=bool)
+    index = np.minimum(np.searchsorted(sorted_ranks, ranks), len(sorted_ranks) - 1)
+    return sorted_ranks[index] == ranks
+
+
+class SuggestIndex:
+    def __init__(self, products, product_words, words, postings, prefix_ranks, categories):
+        # All indexed by rank: 0 is the best rated product
+        self.products = products
+        self.product_words = product_words
+        self.words = words
+        self.postings = postings
+        # Short prefix -> sorted ranks of every product with a word starting with it
+        self.prefix_ranks = prefix_ranks
+        # (category, sorted words, product count), most stocked first
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.products)
+
+    @classmethod
+    def build(cls, products):
+        def rank_key(product):
+            rating = product.get("rating") or {}
+            return -(rating.get("rate") or 0), -(rating.get("count") or 0), product.get("title") or ""
+
+        entries, product_words, postings, prefix_ranks, category_counts, category_words = [], [], {}, {}, {}, {}
+        for rank, product in enumerate(sorted(products, key=rank_key)):
+            entries.append({
+                "id": product["id"],
+                "title": product.get("title"),
+                "category": product.get("category"),
+                "price": product.get("price"),
+                "image": product.get("image"),
+                "rating": (product.get("rating") or {}).get("rate"),
+            })
+            category = product.get("category")
+            if category not in category_words:
+                category_words[category] = _words(category)
+            words = sorted(set(_words(product.get("title"))).union(category_words[category]))
+            product_words.append(tuple(words))
+            for word in words:
+                postings.setdefault(word, []).append(rank)
+            # Ranks arrive in ascending order, so each list comes out sorted
+            for prefix in {word[:length] for word in words for length in range(1, min(len(word), CACHED_PREFIX_LENGTH) + 1)}:
+                prefix_ranks.setdefault(prefix, []).append(rank)
+            if category:
+                category_counts[category] = category_counts.get(category, 0) + 1
+
+        words = sorted(postings)
+        categories = sorted(((name, tuple(sorted(set(category_words[name]))), count) for name, count in category_counts.items()),
+                            key=lambda category: (-category[2], category[0]))
+        prefix_ranks = {prefix: np.array(ranks, dtype=np.int32) for prefix, ranks in prefix_ranks.items()}
+        return cls(entries, product_words, words, [postings[word] for word in words], prefix_ranks, categories)
+
+    def _range(self, prefix):
+        start = bisect_left(self.words, prefix)
+        return start, bisect_left(self.words, prefix + "\U0010ffff", start)
+
+    def _matches(self, prefix, limit):
+        """Products matched by ``prefix`` (postings, for longer prefixes), counted up to ``limit``."""
+        if len(prefix) <= CACHED_PREFIX_LENGTH:
+            return len(self.prefix_ranks.get(prefix, NO_RANKS))
+        start, end = self._range(prefix)
+        if end - start >= limit:
+            # Every word has at least one posting
+            return limit
+        total = 0
+        for postings in self.postings[start:end]:
+            total += len(postings)
+            if total >= limit:
+                break
+        return total
+
+    def _scan_short(self, driver, others, limit):
+        """Ranks matching every word, best first, driven by the precomputed ranks of a short ``driver``."""
+        candidates = self.prefix_ranks.get(driver, NO_RANKS)
+        filters = [self.prefix_ranks.get(word, NO_RANKS) for word in others if len(word) <= CACHED_PREFIX_LENGTH]
+        longer = [word for word in others if len(word) > CACHED_PREFIX_LENGTH]
+        found, start, size = [], 0, limit * CHUNK_PER_RESULT
+        while start < len(candidates):
+            chunk = candidates[start:start + size]
+            for ranks in filters:
+                chunk = chunk[_contains(ranks, chunk)]
+            for rank in chunk.tolist():
+                if all(_has_prefix(self.product_words[rank], word) for word in longer):
+                    found.append(rank)
+                    if len(found) == limit:
+                        return found
+            start, size = start + size, size * CHUNK_PER_RESULT
+        return found
+
+    def _scan_postings(self, driver, others, limit):
+        """Ranks matching every word, best first, merged from the postings of a longer ``driver``."""
+        start, end = self._range(driver)
+        found = []
+        for scanned, rank in enumerate(_unique(heapq.merge(*self.postings[start:end]))):
+            if scanned >= MAX_SCAN:
+                break
+            if all(_has_prefix(self.product_words[rank], word) for word in others):
+                found.append(rank)
+                if len(found) == limit:
+                    break
+        return found
+
+    def suggest(self, query: str, limit: int = 8) -> dict:
+        words = _words(query)
+        if not words:
+            return {"products": [], "categories": []}
+        driver = words[0]
+        if len(words) > 1:
+            # Drive from the word with the fewest matches; counting stops once it cannot win
+            fewest = self._matches(driver, len(self.products) + 1)
+            for word in words[1:]:
+                matches = self._matches(word, fewest)
+                if matches < fewest:
+                    driver, fewest = word, matches
+        others = list(words)
+        others.remove(driver)
+
+        scan = self._scan_short if len(driver) <= CACHED_PREFIX_LENGTH else self._scan_postings
+        products = [self.products[rank] for rank in scan(driver, others, limit)]
+        categories = [name for name, category_words, _ in self.categories
+                      if all(_has_prefix(category_words, word) for word in words)]
+        return {"products": products, "categories": categories[:limit]}
+
+
+class SuggestIndexCache:
+    """The current ``SuggestIndex``; the previous one keeps serving while a rebuild runs."""
+
+    def __init__(self, products: ProductRepository):
+        self.products = products
+        self.index = None
+        self._lock = asyncio.Lock()
+
+    async def rebuild(self) -> SuggestIndex:
+        async with self._lock:
+            products = await self.products.all()
+            # Building takes a couple of seconds at 100k products; keep it off the event loop
+            self.index = await asyncio.to_thread(SuggestIndex.build, products)
+            return self.index
+
+    async def get(self) -> SuggestIndex:
+        if self.index is None:
+            async with self._lock:
+                if self.index is None:
+                    self.index = await asyncio.to_thread(SuggestIndex.build, await self.products.all())
+        return self.index
@@ -0,0 +1,631 @@
+"""Offline load test and latency benchmark for the AI Shopping backend.
+
+Starts the FastAPI app locally with the in-memory repository backend, seeds a
+synthetic catalog, drives a concurrent mixed workload against it and reports
+throughput and p50/p95/p99 latency per route. Results are written as JSON so
+runs can be compared for regressions:
+
+    python backend_benchmark.py --products 100000 --users 50 --duration 60
+    python backend_benchmark.py --compare test_reports/benchmark_baseline.json
+    python backend_benchmark.py --serialization --products 5000
+    python backend_benchmark.py --ingestion --products 100000
+    python backend_benchmark.py --convergence --workers 8 --mongo-url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+CATEGORIES = ["men's clothing", "women's clothing", "jewelery", "electronics"]
+ADJECTIVES = ["classic", "slim", "wireless", "vintage", "premium", "casual", "portable", "waterproof", "gold", "cotton"]
+NOUNS = ["jacket", "shirt", "backpack", "ring", "bracelet", "monitor", "hard drive", "t-shirt", "dress", "headphones"]
+SEARCH_TERMS = ADJECTIVES + NOUNS
+AI_QUERIES = ["warm jacket for winter", "gift for her under 50", "fast storage for gaming", "casual cotton shirt", "gold jewelry"]
+# Typeahead queries as typed, including multi-word queries made only of short prefixes
+SUGGEST_QUERIES = ["s", "wi", "wire", "wireless hea", "gold r", "sl ja", "jacket 123", "men s", "w c",
+                   "1 e", "9 s", "1 2", "12 ring", "ja 9", "1 2 3", "zzz"]
+# Server-side budget for one suggest lookup
+SUGGEST_BUDGET_MS = 1.0
+
+# Relative weight of each workload operation
+DEFAULT_MIX = {"browse": 30, "product": 25, "search": 20, "cart": 15, "checkout": 5, "ai": 5}
+
+
+def generate_products(count, seed=42):
+    rng = random.Random(seed)
+    products = []
+    for product_id in range(1, count + 1):
+        adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+        category = rng.choice(CATEGORIES)
+        products.append({
+            "id": product_id,
+            "title": f"{adjective.title()} {noun.title()} {product_id}",
+            "price": round(rng.uniform(1, 1000), 2),
+            "description": f"A {adjective} {noun} from our {category} range.",
+            "category": category,
+            "image": f"https://example.com/images/{product_id}.jpg",
+            "rating": {"rate": round(rng.uniform(1, 5), 1), "count": rng.randint(0, 1000)},
+        })
+    return products
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class LocalServer:
+    """Runs the app under uvicorn in a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=None):
+        self.host = host
+        self.port = port or self._free_port()
+        self.thread = None
+        self.server = None
+
+    @staticmethod
+    def _free_port():
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, app):
+        import uvicorn
+
+        config = uvicorn.Config(app, host=self.host, port=self.port, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self):
+        if self.server:
+            self.server.should_exit = True
+            self.thread.join(timeout=10)
+
+
+class AIShoppingBenchmark:
+    def __init__(self, base_url, product_count, users, duration, mix, seed=42):
+        self.base_url = base_url
+        self.product_count = product_count
+        self.users = users
+        self.duration = duration
+        self.mix = mix
+        self.seed = seed
+        self.samples = {}
+        self.errors = {}
+        # Latencies of requests shed with 429/503, kept apart so fast rejections do not flatter the percentiles
+        self.shed = {}
+        self.elapsed = 0.0
+        self.registered = 0
+
+    async def request(self, client, route, method, url, **kwargs):
+        """Issue one request and record its latency under the route template"""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if response is not None and response.status_code in (429, 503):
+            # Load shedding by admission control is expected under pressure, not a failure
+            self.shed.setdefault(route, []).append(elapsed_ms)
+            return response
+        self.samples.setdefault(route, []).append(elapsed_ms)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+    async def register_user(self, client, user_index):
+        # Setup work: deliberately not recorded in the samples
+        email = f"bench-{user_index}-{random.getrandbits(32)}@example.com"
+        try:
+            response = await client.post("/api/auth/register", json={"name": f"Bench User {user_index}", "email": email, "password": "benchmark"})
+        except httpx.HTTPError:
+            return None
+        if response.status_code != 200:
+            return None
+        self.registered += 1
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def virtual_user(self, client, user_index, headers, deadline):
+        rng = random.Random(self.seed + user_index)
+        operations, weights = list(self.mix), list(self.mix.values())
+
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            product_id = rng.randint(1, self.product_count)
+            if operation == "browse":
+                params = {"page": rng.randint(1, 50), "limit": 20}
+                sort = rng.choice([None, "price_asc", "rating"])
+                if sort:
+                    params["sort"] = sort
+                await self.request(client, "GET /api/products", "GET", "/api/products", params=params)
+            elif operation == "product":
+                await self.request(client, "GET /api/products/{product_id}", "GET", f"/api/products/{product_id}")
+            elif operation == "search":
+                await self.request(client, "GET /api/products?search", "GET", "/api/products",
+                                   params={"search": rng.choice(SEARCH_TERMS), "limit": 20})
+            elif operation == "cart":
+                await self.request(client, "POST /api/cart", "POST", "/api/cart", json={"product_id": product_id, "quantity": 1}, headers=headers)
+                await self.request(client, "GET /api/cart", "GET", "/api/cart", headers=headers)
+            elif operation == "checkout":
+                await self.request(client, "POST /api/cart", "POST", "/api/cart", json={"product_id": product_id, "quantity": 1}, headers=headers)
+                await self.request(client, "POST /api/orders/checkout", "POST", "/api/orders/checkout",
+                                   json={"items": [], "shipping_address": {"city": "Benchmark"}}, headers=headers)
+                await self.request(client, "GET /api/orders", "GET", "/api/orders", headers=headers)
+            elif operation == "ai":
+                await self.request(client, "POST /api/ai/query", "POST", "/api/ai/query",
+                                   json={"query": rng.choice(AI_QUERIES), "limit": 10}, headers=headers)
+
+    async def run(self):
+        limits = httpx.Limits(max_connections=self.users, max_keepalive_connections=self.users)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=120) as client:
+            # Registration (bcrypt) is setup work, so it stays outside the measured window
+            sessions = await asyncio.gather(*(self.register_user(client, index) for index in range(self.users)))
+            start = time.perf_counter()
+            deadline = start + self.duration
+            await asyncio.gather(*(self.virtual_user(client, index, headers, deadline)
+                                   for index, headers in enumerate(sessions) if headers))
+            self.elapsed = time.perf_counter() - start
+
+    def report(self):
+        routes = {}
+        total = 0
+        for route in sorted(set(self.samples) | set(self.shed)):
+            # Latency percentiles and throughput cover requests that were served; shed ones are reported apart
+            samples, shed = sorted(self.samples.get(route, [])), sorted(self.shed.get(route, []))
+            total += len(samples)
+            routes[route] = {
+                "count": len(samples),
+                "errors": self.errors.get(route, 0),
+                "shed": len(shed),
+                "throughput_rps": round(len(samples) / self.elapsed, 2) if self.elapsed else 0,
+                "mean_ms": round(sum(samples) / len(samples), 3) if samples else None,
+                "p50_ms": round(percentile(samples, 50), 3) if samples else None,
+                "p95_ms": round(percentile(samples, 95), 3) if samples else None,
+                "p99_ms": round(percentile(samples, 99), 3) if samples else None,
+                "max_ms": round(samples[-1], 3) if samples else None,
+                "shed_p50_ms": round(percentile(shed, 50), 3) if shed else None,
+            }
+        return {
+            "summary": {
+                "products": self.product_count,
+                "users": self.users,
+                "registered_users": self.registered,
+                "duration_s": round(self.elapsed, 3),
+                "total_requests": total,
+                "total_errors": sum(self.errors.values()),
+                "total_shed": sum(len(shed) for shed in self.shed.values()),
+                "throughput_rps": round(total / self.elapsed, 2) if self.elapsed else 0,
+                "mix": self.mix,
+                "seed": self.seed,
+                "timestamp": datetime.now().isoformat(),
+            },
+            "routes": routes,
+        }
+
+
+def print_report(report, baseline=None):
+    summary = report["summary"]
+    print("\n" + "=" * 96)
+    print(f"BENCHMARK: {summary['products']} products, {summary['users']} users, {summary['duration_s']}s")
+    print("=" * 96)
+    print(f"{'route':<34}{'count':>8}{'err':>6}{'shed':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Δp95':>8}")
+    for route, stats in report["routes"].items():
+        delta = ""
+        base = (baseline or {}).get("routes", {}).get(route)
+        if base and base.get("p95_ms") and stats["p95_ms"] is not None:
+            delta = f"{(stats['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100:+.0f}%"
+        print(f"{route:<34}{stats['count']:>8}{stats['errors']:>6}{stats['shed']:>6}{stats['throughput_rps']:>10}"
+              f"{str(stats['p50_ms']):>10}{str(stats['p95_ms']):>10}{str(stats['p99_ms']):>10}{delta:>8}")
+    print(f"\n📈 Total: {summary['total_requests']} requests, {summary['throughput_rps']} req/s, "
+          f"{summary['total_errors']} errors, {summary['total_shed']} shed "
+          f"({summary['registered_users']}/{summary['users']} users registered)")
+
+
+def time_per_call(func, min_seconds=0.5):
+    """Mean microseconds per call, repeating until at least ``min_seconds`` has elapsed"""
+    calls, start = 0, time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return round(elapsed / calls * 1e6, 2)
+
+
+def run_serialization_benchmark(product_count, seed=42):
+    """Compare response encoding strategies on large listing and cart payloads"""
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from serialization import CatalogJSONCache
+    from server import Product
+
+    products = generate_products(product_count, seed)
+    cache = CatalogJSONCache(products=None)
+    cache.prime(products)
+    entries = asyncio.run(cache.entries([product["id"] for product in products]))
+    fragments = {product_id: entry[1] for product_id, entry in entries.items()}
+
+    def listing(size):
+        page = products[:size]
+        ids = [product["id"] for product in page]
+        wrap = lambda data: {"data": data, "total": product_count, "page": 1, "limit": size, "pages": 1}
+        return {
+            "jsonable_encoder+json": lambda: json.dumps(jsonable_encoder(wrap(page))).encode(),
+            "pydantic_models+json": lambda: json.dumps(jsonable_encoder(wrap([Product(**p) for p in page]))).encode(),
+            "orjson": lambda: orjson.dumps(wrap(page)),
+            "orjson+fragments": lambda: orjson.dumps(wrap([fragments[i] for i in ids])),
+        }
+
+    def cart(size):
+        lines = [{"id": f"line-{p['id']}", "product_id": p["id"], "quantity": 2} for p in products[:size]]
+        by_id = {p["id"]: p for p in products[:size]}
+        build = lambda embed: {"items": [{"id": line["id"], "product": embed(line["product_id"]), "quantity": line["quantity"],
+                                          "item_total": by_id[line["product_id"]]["price"] * line["quantity"]} for line in lines],
+                               "subtotal": 0}
+        return {
+            "jsonable_encoder+json": lambda: json.dumps(jsonable_encoder(build(by_id.get))).encode(),
+            "orjson": lambda: orjson.dumps(build(by_id.get)),
+            "orjson+fragments": lambda: orjson.dumps(build(fragments.get)),
+        }
+
+    payloads = {
+        "listing_20": listing(20),
+        "listing_100": listing(min(100, product_count)),
+        f"listing_{min(1000, product_count)}": listing(min(1000, product_count)),
+        "cart_50": cart(min(50, product_count)),
+    }
+    results = {}
+    print(f"\n{'payload':<16}{'strategy':<26}{'µs/response':>14}{'bytes':>10}")
+    for payload, strategies in payloads.items():
+        results[payload] = {}
+        for strategy, encode in strategies.items():
+            results[payload][strategy] = {"us_per_response": time_per_call(encode), "bytes": len(encode())}
+            print(f"{payload:<16}{strategy:<26}{results[payload][strategy]['us_per_response']:>14}{results[payload][strategy]['bytes']:>10}")
+    return {"summary": {"products": product_count, "seed": seed, "timestamp": datetime.now().isoformat()}, "serialization": results}
+
+
+def run_suggest_benchmark(product_count, seed=42, samples=200, limit=8):
+    """Time typeahead lookups against a prefix index built from the synthetic catalog"""
+    from suggest import SuggestIndex
+
+    start = time.perf_counter()
+    index = SuggestIndex.build(generate_products(product_count, seed))
+    build_seconds = time.perf_counter() - start
+
+    results = {}
+    print(f"\nBuilt suggest index for {product_count} products in {build_seconds:.2f}s")
+    print(f"{'query':<16}{'results':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for query in SUGGEST_QUERIES:
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            suggestions = index.suggest(query, limit)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[query] = {
+            "results": len(suggestions["products"]),
+            "p50_ms": round(percentile(timings, 50), 4),
+            "p99_ms": round(percentile(timings, 99), 4),
+            "max_ms": round(timings[-1], 4),
+        }
+        print(f"{query!r:<16}{results[query]['results']:>9}{results[query]['p50_ms']:>10}{results[query]['p99_ms']:>10}{results[query]['max_ms']:>10}")
+    within_budget = all(result["p99_ms"] <= SUGGEST_BUDGET_MS for result in results.values())
+    print(f"{'✅' if within_budget else '❌'} p99 {'within' if within_budget else 'over'} {SUGGEST_BUDGET_MS}ms for every query")
+    return {"summary": {"products": product_count, "seed": seed, "build_seconds": round(build_seconds, 3), "budget_ms": SUGGEST_BUDGET_MS,
+                        "within_budget": within_budget, "timestamp": datetime.now().isoformat()},
+            "suggest": results}
+
+
+def create_stub_upstream(products, page_size=1000, shards=4, chunk_size=64 * 1024):
+    """Local stand-in for the upstream catalog API.
+
+    Serves the catalog whole (/products), paginated (/products/page/{page})
+    and sharded (/shards/{shard}) with ETag support. The body is streamed in
+    chunks, and the first request for each path fails with 503 so client
+    retries are exercised.
+    """
+    from starlette.applications import Starlette
+    from starlette.responses import Response, StreamingResponse
+    from starlette.routing import Route
+
+    state = {"version": 1, "requests": 0, "failed_paths": set()}
+
+    def respond(request, selection):
+        state["requests"] += 1
+        if request.url.path not in state["failed_paths"]:
+            state["failed_paths"].add(request.url.path)
+            return Response(status_code=503)
+        etag = f'"v{state["version"]}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        body = json.dumps(selection).encode()
+
+        async def chunks():
+            for start in range(0, len(body), chunk_size):
+                yield body[start:start + chunk_size]
+
+        return StreamingResponse(chunks(), media_type="application/json", headers={"ETag": etag})
+
+    async def full(request):
+        return respond(request, products)
+
+    async def page(request):
+        number = int(request.path_params["page"])
+        return respond(request, products[(number - 1) * page_size:number * page_size])
+
+    async def shard(request):
+        number = int(request.path_params["shard"])
+        return respond(request, products[number::shards])
+
+    app = Starlette(routes=[Route("/products", full), Route("/products/page/{page}", page), Route("/shards/{shard}", shard)])
+    return app, state
+
+
+def run_ingestion_benchmark(product_count, seed=42, concurrency=4):
+    """Sync from a local stub upstream: cold, unchanged and changed, for whole, paginated and sharded sources"""
+    from ingestion import CatalogIngestor
+    from repositories import InMemoryProductRepository
+
+    products = generate_products(product_count, seed)
+    stub, stub_state = create_stub_upstream(products)
+    upstream = LocalServer()
+    upstream.start(stub)
+    layouts = {
+        "whole": [f"{upstream.base_url}/products"],
+        "paginated": [f"{upstream.base_url}/products/page/{{page}}"],
+        "sharded": [f"{upstream.base_url}/shards/{shard}" for shard in range(4)],
+    }
+    results = {}
+
+    async def run_layout(sources):
+        repository = InMemoryProductRepository()
+        ingestor = CatalogIngestor(sources, concurrency=concurrency, backoff=0.05)
+        runs = {}
+        try:
+            for phase in ("cold", "unchanged", "changed"):
+                if phase == "changed":
+                    stub_state["version"] += 1
+                start = time.perf_counter()
+                result = await ingestor.sync(repository)
+                elapsed = time.perf_counter() - start
+                runs[phase] = {
+                    "changed": result.changed,
+                    "products": len(repository.by_id),
+                    "requests": result.requests,
+                    "seconds": round(elapsed, 4),
+                    "products_per_s": round(result.count / elapsed, 1) if result.count else 0,
+                }
+        finally:
+            await ingestor.close()
+        return runs
+
+    try:
+        print(f"\n{'layout':<12}{'phase':<12}{'changed':>9}{'requests':>10}{'seconds':>10}{'products/s':>14}")
+        for layout, sources in layouts.items():
+            results[layout] = asyncio.run(run_layout(sources))
+            for phase, run in results[layout].items():
+                print(f"{layout:<12}{phase:<12}{str(run['changed']):>9}{run['requests']:>10}{run['seconds']:>10}{run['products_per_s']:>14}")
+    finally:
+        upstream.stop()
+    return {"summary": {"products": product_count, "concurrency": concurrency, "seed": seed, "timestamp": datetime.now().isoformat()},
+            "ingestion": results}
+
+
+def open_mongo_repositories(mongo_url, db_name):
+    from repositories import create_repositories
+
+    return create_repositories("mongo", mongo_url, db_name)
+
+
+def convergence_worker(open_repositories, poll_interval, change_streams, reports, stop):
+    """One worker process: follow the shared catalog version and report each products version it applies"""
+    from catalog_version import CatalogVersionWatcher
+
+    async def run():
+        repos = open_repositories()
+        watcher = CatalogVersionWatcher(repos.catalog_versions, poll_interval=poll_interval, change_streams=change_streams)
+        watcher.on_change("products", lambda state: reports.put((os.getpid(), state["version"], time.time())))
+        await watcher.refresh()
+        watcher.start()
+        reports.put((os.getpid(), None, time.time()))
+        try:
+            while not stop.is_set():
+                await asyncio.sleep(0.05)
+        finally:
+            await watcher.stop()
+            repos.close()
+
+    asyncio.run(run())
+
+
+def run_convergence_check(open_repositories, workers=4, rounds=5, poll_interval=0.5, change_streams=False, bound=None):
+    """Publish catalog versions from this process and time how long every worker process takes to apply each one"""
+    bound = bound or poll_interval + 1.0
+    context = multiprocessing.get_context("spawn")
+    reports, stop = context.Queue(), context.Event()
+    processes = [context.Process(target=convergence_worker, args=(open_repositories, poll_interval, change_streams, reports, stop), daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    async def publish_rounds():
+        loop = asyncio.get_running_loop()
+        receive = functools.partial(loop.run_in_executor, None, reports.get, True)
+        ready = set()
+        while len(ready) < workers:
+            pid, version, _ = await receive(60)
+            if version is None:
+                ready.add(pid)
+
+        repos = open_repositories()
+        results = []
+        try:
+            for number in range(1, rounds + 1):
+                document = await repos.catalog_versions.bump("products")
+                target, published = document["components"]["products"]["version"], time.time()
+                applied = {}
+                while len(applied) < workers:
+                    try:
+                        pid, version, at = await receive(max(0.1, published + bound * 5 - time.time()))
+                    except queue.Empty:
+                        break
+                    if version is not None and version >= target:
+                        applied.setdefault(pid, at - published)
+                lags = sorted(applied.values())
+                results.append({
+                    "round": number,
+                    "version": target,
+                    "workers_applied": len(applied),
+                    "max_seconds": round(lags[-1], 4) if lags else None,
+                    "mean_seconds": round(sum(lags) / len(lags), 4) if lags else None,
+                    "converged": len(applied) == workers and lags[-1] <= bound,
+                })
+                # Spread rounds so each lands at a different point in the workers' poll cycles
+                await asyncio.sleep(poll_interval * random.uniform(0.5, 1.5))
+        finally:
+            repos.close()
+        return results
+
+    try:
+        results = asyncio.run(publish_rounds())
+    finally:
+        stop.set()
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+    print(f"\n{'round':<8}{'version':>9}{'applied':>10}{'max s':>10}{'mean s':>10}{'converged':>11}")
+    for result in results:
+        print(f"{result['round']:<8}{result['version']:>9}{result['workers_applied']:>10}{str(result['max_seconds']):>10}"
+              f"{str(result['mean_seconds']):>10}{str(result['converged']):>11}")
+    converged = all(result["converged"] for result in results)
+    print(f"{'✅' if converged else '❌'} {workers} workers {'converged' if converged else 'did not converge'} within {bound}s")
+    return {"summary": {"workers": workers, "rounds": rounds, "poll_interval": poll_interval, "change_streams": change_streams,
+                        "bound_seconds": bound, "converged": converged, "timestamp": datetime.now().isoformat()},
+            "rounds": results}
+
+
+def save_report(report, kind, output=None):
+    output = Path(output or ROOT_DIR / "test_reports" / f"{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results saved to {output}")
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(",")):
+        name, weight = part.split("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        mix[name] = int(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI Shopping backend offline")
+    parser.add_argument("--products", type=int, default=10000, help="synthetic catalog size")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to drive load")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX), help="operation weights, e.g. ai=0,search=40")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="result JSON path (default: test_reports/benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", help="previous result JSON to compare p95 latencies against")
+    parser.add_argument("--serialization", action="store_true", help="only benchmark response serialization strategies")
+    parser.add_argument("--ingestion", action="store_true", help="only benchmark catalog ingestion from a local stub upstream")
+    parser.add_argument("--suggest", action="store_true", help="only time typeahead lookups (use --products 100000 for the target size)")
+    parser.add_argument("--convergence", action="store_true", help="only check that worker processes converge on a new catalog version")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes for --convergence")
+    parser.add_argument("--rounds", type=int, default=5, help="catalog versions to publish for --convergence")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="catalog version poll interval for --convergence")
+    parser.add_argument("--change-streams", action="store_true", help="let --convergence workers use change streams (needs a replica set)")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL"), help="MongoDB shared by the --convergence workers")
+    args = parser.parse_args()
+
+    if args.convergence:
+        # Worker processes only share state through MongoDB; use a throwaway database
+        if not args.mongo_url:
+            parser.error("--convergence needs --mongo-url or MONGO_URL")
+        db_name = f"ai_shopping_convergence_{os.getpid()}"
+        try:
+            report = run_convergence_check(functools.partial(open_mongo_repositories, args.mongo_url, db_name), args.workers,
+                                           args.rounds, args.poll_interval, args.change_streams)
+        finally:
+            from pymongo import MongoClient
+            MongoClient(args.mongo_url).drop_database(db_name)
+        save_report(report, "convergence", args.output)
+        return 0 if report["summary"]["converged"] else 1
+
+    if args.suggest:
+        report = run_suggest_benchmark(args.products, args.seed)
+        save_report(report, "suggest", args.output)
+        return 0 if report["summary"]["within_budget"] else 1
+
+    # The app must come up on the in-memory backend without reaching the upstream catalog
+    os.environ["REPOSITORY_BACKEND"] = "memory"
+    os.environ["SYNC_PRODUCTS_ON_STARTUP"] = "false"
+    import server
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.serialization or args.ingestion:
+        kind = "serialization" if args.serialization else "ingestion"
+        runner = run_serialization_benchmark if args.serialization else run_ingestion_benchmark
+        report = runner(args.products, args.seed)
+        save_report(report, kind, args.output)
+        return 0
+
+    print(f"🌱 Seeding {args.products} synthetic products...")
+    asyncio.run(server.repos.products.replace_all(generate_products(args.products, args.seed)))
+
+    local = LocalServer()
+    local.start(server.app)
+    print(f"🚀 App running at {local.base_url}")
+    try:
+        benchmark = AIShoppingBenchmark(local.base_url, args.products, args.users, args.duration, args.mix, args.seed)
+        asyncio.run(benchmark.run())
+    finally:
+        local.stop()
+
+    report = benchmark.report()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    save_report(report, "benchmark", args.output)
+    summary = report["summary"]
+    return 0 if summary["total_errors"] == 0 and summary["registered_users"] == summary["users"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
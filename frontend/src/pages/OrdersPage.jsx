@@ -23,7 +23,10 @@ const OrdersPage = () => {
   const { isAuthenticated } = useSelector((state) => state.auth);
   
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [orderCount, setOrderCount] = useState(0);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     if (!isAuthenticated) {
@@ -36,8 +39,13 @@ const OrdersPage = () => {
 
   const fetchOrders = async () => {
     try {
-      const response = await api.get('/orders');
-      setOrders(response.data.orders || []);
+      const [ordersResponse, summaryResponse] = await Promise.all([
+        api.get('/orders'),
+        api.get('/orders/summary'),
+      ]);
+      setOrders(ordersResponse.data.orders || []);
+      setNextCursor(ordersResponse.data.next_cursor || null);
+      setOrderCount(summaryResponse.data.order_count || 0);
     } catch (error) {
       console.error('Error fetching orders:', error);
       toast.error('Failed to load orders');
@@ -46,6 +54,21 @@ const OrdersPage = () => {
     }
   };
 
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const response = await api.get('/orders', { params: { cursor: nextCursor } });
+      setOrders((prev) => [...prev, ...(response.data.orders || [])]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching orders:', error);
+      toast.error('Failed to load more orders');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleDateString('en-US', {
       year: 'numeric',
@@ -92,7 +115,7 @@ const OrdersPage = () => {
         <div className="flex items-center space-x-3 mb-8">
           <Package className="w-8 h-8 text-blue-600" />
           <h1 className="text-3xl font-bold text-slate-900">My Orders</h1>
-          <span className="text-slate-500">({orders.length} orders)</span>
+          <span className="text-slate-500">({orderCount} orders)</span>
         </div>
 
         {orders.length === 0 ? (
@@ -219,6 +242,19 @@ const OrdersPage = () => {
               </Card>
             ))}
 
+            {nextCursor && (
+              <div className="text-center">
+                <Button
+                  variant="outline"
+                  onClick={loadMoreOrders}
+                  disabled={isLoadingMore}
+                  data-testid="load-more-orders"
+                >
+                  {isLoadingMore ? 'Loading...' : 'Load More Orders'}
+                </Button>
+              </div>
+            )}
+
             <div className="text-center pt-6">
               <Button 
                 onClick={() => navigate('/products')}
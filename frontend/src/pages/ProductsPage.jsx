@@ -37,6 +37,8 @@ const ProductsPage = () => {
   const [isLoading, setIsLoading] = useState(true);
   const [totalPages, setTotalPages] = useState(1);
   const [currentPage, setCurrentPage] = useState(1);
+  // Bumped to refetch once filter changes set in the same handler have been applied
+  const [fetchRequest, setFetchRequest] = useState(0);
   
   // Filter states
   const [searchQuery, setSearchQuery] = useState(searchParams.get('search') || '');
@@ -45,6 +47,8 @@ const ProductsPage = () => {
   const [maxPrice, setMaxPrice] = useState(searchParams.get('max_price') || '');
   const [sortBy, setSortBy] = useState(searchParams.get('sort') || '');
   const [showFilters, setShowFilters] = useState(false);
+  const [suggestions, setSuggestions] = useState({ products: [], categories: [] });
+  const [showSuggestions, setShowSuggestions] = useState(false);
 
   const categories = [
     'electronics',
@@ -55,7 +59,29 @@ const ProductsPage = () => {
 
   useEffect(() => {
     fetchProducts();
-  }, [currentPage]);
+  }, [currentPage, fetchRequest]);
+
+  useEffect(() => {
+    // Typeahead: the suggest index is cheap enough to query on every keystroke, debounce only to save requests
+    const query = searchQuery.trim();
+    if (!query) {
+      setSuggestions({ products: [], categories: [] });
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.get('/products/suggest', { params: { q: query, limit: 6 } });
+        if (!cancelled) setSuggestions(response.data);
+      } catch (error) {
+        console.error('Error fetching suggestions:', error);
+      }
+    }, 120);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchQuery]);
 
   useEffect(() => {
     // Update URL params
@@ -111,6 +137,7 @@ const handleAddToWishlist = async (productId) => {
 
   const handleSearch = (e) => {
     e.preventDefault();
+    setShowSuggestions(false);
     setCurrentPage(1);
     fetchProducts();
   };
@@ -221,13 +248,60 @@ const handleAddToWishlist = async (productId) => {
               <form onSubmit={handleSearch} className="mb-6">
                 <Label htmlFor="search">Search Products</Label>
                 <div className="flex space-x-2 mt-2">
-                  <Input
-                    id="search"
-                    value={searchQuery}
-                    onChange={(e) => setSearchQuery(e.target.value)}
-                    placeholder="Search products..."
-                    data-testid="search-input"
-                  />
+                  <div className="relative flex-1">
+                    <Input
+                      id="search"
+                      value={searchQuery}
+                      onChange={(e) => {
+                        setSearchQuery(e.target.value);
+                        setShowSuggestions(true);
+                      }}
+                      onFocus={() => setShowSuggestions(true)}
+                      onBlur={() => setTimeout(() => setShowSuggestions(false), 150)}
+                      placeholder="Search products..."
+                      autoComplete="off"
+                      data-testid="search-input"
+                    />
+                    {showSuggestions && (suggestions.products.length > 0 || suggestions.categories.length > 0) && (
+                      <div className="absolute z-20 mt-1 w-full rounded-md border bg-white shadow-lg" data-testid="search-suggestions">
+                        {suggestions.categories.map((category) => (
+                          <button
+                            key={category}
+                            type="button"
+                            className="block w-full px-3 py-2 text-left text-sm text-slate-600 hover:bg-slate-50"
+                            onMouseDown={(e) => e.preventDefault()}
+                            onClick={() => {
+                              setSelectedCategory(category);
+                              setSearchQuery('');
+                              setShowSuggestions(false);
+                              setCurrentPage(1);
+                              setFetchRequest((count) => count + 1);
+                            }}
+                          >
+                            in <span className="font-medium capitalize">{category}</span>
+                          </button>
+                        ))}
+                        {suggestions.products.map((product) => (
+                          <button
+                            key={product.id}
+                            type="button"
+                            className="flex w-full items-center space-x-2 px-3 py-2 text-left text-sm hover:bg-slate-50"
+                            onMouseDown={(e) => e.preventDefault()}
+                            onClick={() => navigate(`/products/${product.id}`)}
+                          >
+                            <img src={product.image} alt="" className="h-8 w-8 object-contain" />
+                            <span className="flex-1 truncate">{product.title}</span>
+                            {product.rating != null && (
+                              <span className="flex items-center text-xs text-slate-500">
+                                <Star className="mr-0.5 h-3 w-3 fill-yellow-400 text-yellow-400" />
+                                {product.rating}
+                              </span>
+                            )}
+                          </button>
+                        ))}
+                      </div>
+                    )}
+                  </div>
                   <Button type="submit" size="icon" data-testid="search-button">
                     <Search className="w-4 h-4" />
                   </Button>
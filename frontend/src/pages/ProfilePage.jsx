@@ -15,6 +15,7 @@ import {
   LogOut,
   Edit
 } from 'lucide-react';
+import api from '../utils/api';
 
 const ProfilePage = () => {
   const navigate = useNavigate();
@@ -26,6 +27,7 @@ const ProfilePage = () => {
     name: '',
     email: '',
   });
+  const [orderSummary, setOrderSummary] = useState(null);
 
   // ✅ Load user info properly on mount and Redux update
   useEffect(() => {
@@ -43,6 +45,10 @@ const ProfilePage = () => {
         email: storedUser.email || '',
       });
     }
+
+    api.get('/orders/summary')
+      .then((response) => setOrderSummary(response.data))
+      .catch((error) => console.error('Error fetching order summary:', error));
   }, [isAuthenticated, user, dispatch, navigate]);
 
   const handleInputChange = (e) => {
@@ -151,6 +157,27 @@ const ProfilePage = () => {
                 </div>
               </div>
 
+              {orderSummary && (
+                <div className="grid grid-cols-3 gap-4 pt-2" data-testid="order-summary">
+                  <div className="px-3 py-2 bg-slate-50 rounded-md">
+                    <div className="text-sm text-slate-500">Orders</div>
+                    <div className="font-semibold text-slate-900">{orderSummary.order_count}</div>
+                  </div>
+                  <div className="px-3 py-2 bg-slate-50 rounded-md">
+                    <div className="text-sm text-slate-500">Total Spent</div>
+                    <div className="font-semibold text-slate-900">${orderSummary.lifetime_spend.toFixed(2)}</div>
+                  </div>
+                  <div className="px-3 py-2 bg-slate-50 rounded-md">
+                    <div className="text-sm text-slate-500">Last Order</div>
+                    <div className="font-semibold text-slate-900">
+                      {orderSummary.last_order_at
+                        ? new Date(orderSummary.last_order_at).toLocaleDateString('en-US')
+                        : 'None'}
+                    </div>
+                  </div>
+                </div>
+              )}
+
               {isEditing && (
                 <div className="flex space-x-3 pt-4">
                   <Button 
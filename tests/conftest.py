@@ -0,0 +1,28 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).parent.parent
+# The backend is a flat set of modules run from its own directory (uvicorn server:app)
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+sys.path.insert(0, str(ROOT_DIR))
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The API module on the in-memory backend; startup hooks (catalog sync, model load) are not run."""
+    pytest.importorskip("sentence_transformers")
+    os.environ["REPOSITORY_BACKEND"] = "memory"
+    os.environ["SYNC_PRODUCTS_ON_STARTUP"] = "false"
+    import server
+
+    return server
+
+
+@pytest.fixture
+def api(server):
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://testserver")
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, TokenBucketLimiter
+
+
+async def attempt(controller, hold, key=None):
+    try:
+        async with controller.admit(key):
+            await asyncio.sleep(hold)
+            return "ok"
+    except AdmissionRejected as e:
+        return e.status_code, e.headers["Retry-After"]
+
+
+def test_requests_beyond_concurrency_and_queue_are_shed_with_503():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=2, max_queue=2, queue_timeout=1.0)
+        results = await asyncio.gather(*(attempt(controller, 0.05) for _ in range(6)))
+        return results, controller.stats()
+
+    results, stats = asyncio.run(scenario())
+    # Two run, two queue behind them, the rest are rejected straight away
+    assert results == ["ok"] * 4 + [(503, "1")] * 2
+    assert stats == {"in_flight": 0, "queue_depth": 0, "max_concurrency": 2, "max_queue": 2}
+
+
+def test_queued_request_that_misses_its_deadline_is_shed():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=5, queue_timeout=0.05)
+        return await asyncio.gather(attempt(controller, 0.3), attempt(controller, 0))
+
+    assert asyncio.run(scenario()) == ["ok", (503, "1")]
+
+
+def test_slot_is_released_when_the_admitted_work_fails():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=0, queue_timeout=0.1)
+        with pytest.raises(RuntimeError):
+            async with controller.admit():
+                raise RuntimeError("boom")
+        return await attempt(controller, 0), controller.stats()["in_flight"]
+
+    assert asyncio.run(scenario()) == ("ok", 0)
+
+
+def test_caller_over_its_rate_gets_429_with_retry_after():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=10, max_queue=10, queue_timeout=1.0, rate=0.5, burst=2)
+        results = [await attempt(controller, 0, key="alice") for _ in range(3)]
+        # Buckets are per key
+        results.append(await attempt(controller, 0, key="bob"))
+        return results
+
+    assert asyncio.run(scenario()) == ["ok", "ok", (429, "2"), "ok"]
+
+
+def test_token_bucket_refills_at_its_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("admission.time.monotonic", lambda: now[0])
+    limiter = TokenBucketLimiter(rate=2, burst=1)
+    assert limiter.acquire("key") == 0
+    assert limiter.acquire("key") == pytest.approx(0.5)
+    now[0] += 0.5
+    assert limiter.acquire("key") == 0
+
+
+def test_zero_rate_disables_limiting():
+    limiter = TokenBucketLimiter(rate=0, burst=1)
+    assert all(limiter.acquire("key") == 0 for _ in range(100))
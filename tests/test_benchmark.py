@@ -0,0 +1,30 @@
+import asyncio
+
+import httpx
+
+from backend_benchmark import AIShoppingBenchmark
+
+
+def test_shed_requests_stay_out_of_the_latency_percentiles():
+    async def handler(request):
+        if request.url.path == "/api/ai/query" and request.headers.get("x-shed"):
+            return httpx.Response(503, headers={"Retry-After": "1"})
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, json={})
+
+    async def scenario():
+        benchmark = AIShoppingBenchmark("http://testserver", product_count=10, users=1, duration=1, mix={"ai": 1})
+        benchmark.elapsed = 1.0
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://testserver") as client:
+            for _ in range(3):
+                await benchmark.request(client, "POST /api/ai/query", "POST", "/api/ai/query")
+            for _ in range(20):
+                await benchmark.request(client, "POST /api/ai/query", "POST", "/api/ai/query", headers={"x-shed": "1"})
+            await benchmark.request(client, "GET /api/cart", "GET", "/api/cart", headers={"x-shed": "1"})
+        return benchmark.report()
+
+    report = asyncio.run(scenario())
+    ai = report["routes"]["POST /api/ai/query"]
+    assert (ai["count"], ai["shed"], ai["errors"]) == (3, 20, 0)
+    assert ai["p50_ms"] >= 20 and ai["shed_p50_ms"] < 20
+    assert report["summary"]["total_requests"] == 4 and report["summary"]["total_shed"] == 20
@@ -0,0 +1,130 @@
+import asyncio
+import copy
+import fcntl
+import functools
+import json
+import os
+import uuid
+
+import pytest
+
+from backend_benchmark import open_mongo_repositories, run_convergence_check
+from catalog_version import CatalogVersionWatcher
+from repositories import CatalogVersionRepository, InMemoryCatalogVersionRepository, Repositories
+
+POLL_INTERVAL = 0.3
+# Time for a worker to notice, read and apply a version on top of its poll interval
+SLACK = 1.0
+
+
+class FileCatalogVersionRepository(CatalogVersionRepository):
+    """The shared version document in a JSON file, so separate processes can follow it without a database."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"_id": "catalog", "version": 0, "components": {}, "validators": {}}
+
+    def _update(self, change):
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            document = self._read()
+            change(document)
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(document, f)
+            os.replace(self.path + ".tmp", self.path)
+            return document
+
+    async def get(self):
+        document = self._read()
+        return document if document["version"] else None
+
+    async def bump(self, *components):
+        def increment(document):
+            document["version"] += 1
+            for name in components:
+                document["components"][name] = {"version": document["components"].get(name, {}).get("version", 0) + 1}
+
+        return self._update(increment)
+
+    async def get_validators(self, component):
+        return self._read()["validators"].get(component, {})
+
+    async def save_validators(self, component, validators):
+        self._update(lambda document: document["validators"].__setitem__(component, copy.deepcopy(validators)))
+
+
+class FileRepositories(Repositories):
+    def __init__(self, path):
+        self.catalog_versions = FileCatalogVersionRepository(path)
+
+
+def open_file_repositories(path):
+    return FileRepositories(path)
+
+
+def mongo_url():
+    url = os.environ.get("MONGO_URL")
+    if not url:
+        return None
+    pymongo = pytest.importorskip("pymongo")
+    try:
+        pymongo.MongoClient(url, serverSelectionTimeoutMS=1000).admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        return None
+    return url
+
+
+def assert_converged(report):
+    assert report["summary"]["converged"], report["rounds"]
+    assert all(result["max_seconds"] <= POLL_INTERVAL + SLACK for result in report["rounds"])
+
+
+def test_watchers_in_separate_processes_converge_within_a_poll_interval(tmp_path):
+    open_repositories = functools.partial(open_file_repositories, str(tmp_path / "catalog_version.json"))
+    report = run_convergence_check(open_repositories, workers=4, rounds=3, poll_interval=POLL_INTERVAL,
+                                   change_streams=False, bound=POLL_INTERVAL + SLACK)
+    assert_converged(report)
+    assert [result["workers_applied"] for result in report["rounds"]] == [4, 4, 4]
+
+
+def test_watchers_converge_through_mongo():
+    url = mongo_url()
+    if url is None:
+        pytest.skip("no MongoDB server at MONGO_URL")
+    db_name = f"catalog_version_test_{uuid.uuid4().hex[:8]}"
+    try:
+        report = run_convergence_check(functools.partial(open_mongo_repositories, url, db_name), workers=4, rounds=3,
+                                       poll_interval=POLL_INTERVAL, change_streams=True, bound=POLL_INTERVAL + SLACK)
+        assert_converged(report)
+    finally:
+        import pymongo
+
+        pymongo.MongoClient(url).drop_database(db_name)
+
+
+def test_watcher_runs_only_the_handlers_of_components_that_moved():
+    async def scenario():
+        versions = InMemoryCatalogVersionRepository()
+        watcher = CatalogVersionWatcher(versions, change_streams=False)
+        calls = []
+        watcher.on_change("products", lambda state: calls.append(("products", state["version"])))
+
+        async def rebuild(state):
+            calls.append(("embeddings", state["version"]))
+
+        watcher.on_change("embeddings", rebuild)
+
+        assert await watcher.publish("products") == ["products"]
+        await versions.bump("embeddings")
+        assert await watcher.refresh() == ["embeddings"]
+        # Re-reading the same document is a no-op
+        assert await watcher.refresh() == []
+        return calls
+
+    assert asyncio.run(scenario()) == [("products", 1), ("embeddings", 1)]
@@ -0,0 +1,90 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import build_embeddings
+from backend_benchmark import generate_products
+from embedding_index import MODEL_NAME, EmbeddingIndex, EmbeddingIndexWriter, product_text, read_manifest
+from repositories import create_repositories
+
+
+class FakeModel:
+    """Deterministic vectors from the text; the chunk after the first ``fail_after`` fails to encode."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        if len(self.encoded) == self.fail_after:
+            self.fail_after = None
+            raise RuntimeError("interrupted")
+        self.encoded.append(list(texts))
+        vectors = np.array([[len(text), sum(map(ord, text)) % 97, 1.0] for text in texts], dtype=np.float64)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(repos, path, model, monkeypatch, fresh=False):
+    monkeypatch.setattr(build_embeddings, "_model", model)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return asyncio.run(build_embeddings.build_index(repos, str(path), workers=1, chunk_size=10, fresh=fresh, executor=executor))
+
+
+@pytest.fixture
+def repos():
+    repos = create_repositories("memory")
+    asyncio.run(repos.products.replace_all(generate_products(95)))
+    return repos
+
+
+def test_interrupted_build_resumes_after_the_last_checkpoint(repos, tmp_path, monkeypatch):
+    with pytest.raises(RuntimeError):
+        build(repos, tmp_path / "resumed", FakeModel(fail_after=4), monkeypatch)
+    checkpoint = read_manifest(str(tmp_path / "resumed.partial"))
+    assert (checkpoint["count"], checkpoint["last_id"], checkpoint["complete"]) == (40, 40, False)
+
+    model = FakeModel()
+    manifest = build(repos, tmp_path / "resumed", model, monkeypatch)
+    # Only the products after the checkpoint are encoded again
+    assert sum(len(texts) for texts in model.encoded) == 55
+    assert (manifest["count"], manifest["last_id"], manifest["complete"]) == (95, 95, True)
+
+    build(repos, tmp_path / "fresh", FakeModel(), monkeypatch, fresh=True)
+    resumed, fresh = EmbeddingIndex.load(str(tmp_path / "resumed")), EmbeddingIndex.load(str(tmp_path / "fresh"))
+    assert resumed.ids.tolist() == fresh.ids.tolist() == list(range(1, 96))
+    assert np.array_equal(np.asarray(resumed.vectors), np.asarray(fresh.vectors))
+
+
+def test_fresh_build_discards_an_interrupted_one(repos, tmp_path, monkeypatch):
+    with pytest.raises(RuntimeError):
+        build(repos, tmp_path / "index", FakeModel(fail_after=2), monkeypatch)
+    model = FakeModel()
+    build(repos, tmp_path / "index", model, monkeypatch, fresh=True)
+    assert sum(len(texts) for texts in model.encoded) == 95
+
+
+def test_search_finds_products_added_after_the_index_was_built(server, tmp_path, monkeypatch):
+    if server.model is None:
+        server.init_ai_model()
+    products = generate_products(100)
+    added = {**products[0], "id": 101, "title": "Quantum Flux Capacitor Kettle", "description": "Boils water through time"}
+
+    async def scenario():
+        await server.repos.products.replace_all(products)
+        versions = await server.repos.catalog_versions.get()
+        writer = EmbeddingIndexWriter(str(tmp_path / "index"), MODEL_NAME, ((versions or {}).get("components") or {}).get("products", {}).get("version"), resume=False)
+        writer.append([product["id"] for product in products], server.model.encode([product_text(product) for product in products], normalize_embeddings=True))
+        writer.finish()
+        monkeypatch.setattr(server, "embedding_index", EmbeddingIndex.load(str(tmp_path / "index")))
+        monkeypatch.setattr(server, "index_gap", None)
+
+        await server.repos.products.replace_all(products + [added])
+        await server.repos.catalog_versions.bump("products")
+        await server.catalog_version.refresh()
+        return await server.semantic_search(added["title"], 3)
+
+    results = asyncio.run(scenario())
+    assert results[0]["product_id"] == 101
+    assert len(server.index_gap[2]) == 1
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from starlette.requests import Request
+
+from http_cache import CACHE_POLICIES, CatalogHTTPCache
+
+UPDATED_AT = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def make_request(path="/api/products", query="", **headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_etag_depends_on_catalog_version_and_full_url():
+    cache = CatalogHTTPCache(version=3, updated_at=UPDATED_AT)
+    etag = cache.etag(make_request(query="page=1"))
+    assert etag.startswith('W/"3-')
+    assert etag == cache.etag(make_request(query="page=1"))
+    assert etag != cache.etag(make_request(query="page=2"))
+    assert etag != cache.etag(make_request(path="/api/products/1", query="page=1"))
+    cache.bump()
+    assert cache.etag(make_request(query="page=1")).startswith('W/"4-')
+
+
+def test_headers_carry_validators_and_the_route_policy():
+    headers = CatalogHTTPCache(version=1, updated_at=UPDATED_AT).headers(make_request(), "product")
+    # Last-Modified has whole-second precision
+    assert headers["Last-Modified"] == format_datetime(UPDATED_AT.replace(microsecond=0), usegmt=True)
+    assert headers["Cache-Control"] == CACHE_POLICIES["product"]
+
+
+def test_matching_if_none_match_is_answered_with_304():
+    cache = CatalogHTTPCache(version=1, updated_at=UPDATED_AT)
+    etag = cache.etag(make_request())
+    for if_none_match in (etag, etag[2:], f'"other", {etag}', "*"):
+        headers, response = cache.check(make_request(if_none_match=if_none_match), "products")
+        assert response is not None and response.status_code == 304
+        assert response.headers["etag"] == etag == headers["ETag"]
+
+
+def test_stale_etag_gets_a_full_response_after_a_bump():
+    cache = CatalogHTTPCache(version=1, updated_at=UPDATED_AT)
+    etag = cache.etag(make_request())
+    cache.bump(updated_at=UPDATED_AT + timedelta(hours=1))
+    headers, response = cache.check(make_request(if_none_match=etag), "products")
+    assert response is None and headers["ETag"] != etag
+
+
+def test_if_modified_since_is_compared_at_second_precision():
+    cache = CatalogHTTPCache(version=1, updated_at=UPDATED_AT)
+    current = format_datetime(UPDATED_AT.replace(microsecond=0), usegmt=True)
+    earlier = format_datetime(UPDATED_AT.replace(microsecond=0) - timedelta(seconds=1), usegmt=True)
+    assert cache.check(make_request(if_modified_since=current), "products")[1].status_code == 304
+    assert cache.check(make_request(if_modified_since=earlier), "products")[1] is None
+    assert cache.check(make_request(if_modified_since="not a date"), "products")[1] is None
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    cache = CatalogHTTPCache(version=1, updated_at=UPDATED_AT)
+    current = format_datetime(UPDATED_AT.replace(microsecond=0), usegmt=True)
+    _, response = cache.check(make_request(if_none_match='W/"0-stale"', if_modified_since=current), "products")
+    assert response is None
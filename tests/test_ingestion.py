@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+
+import httpx
+import pytest
+
+from backend_benchmark import LocalServer, create_stub_upstream, generate_products
+from ingestion import CatalogIngestor, JSONArrayStreamParser
+from repositories import InMemoryProductRepository
+
+PRODUCT_COUNT = 2500
+
+
+def parse_in_chunks(payload: bytes, size: int):
+    parser, items = JSONArrayStreamParser(), []
+    for start in range(0, len(payload), size):
+        items.extend(parser.feed(payload[start:start + size]))
+    items.extend(parser.close())
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_parser_matches_json_loads_for_any_chunking(size):
+    document = [
+        {"id": 1, "title": "Café ☕ [sale], \"quoted\"", "price": 109.95, "tags": ["a", {"b": None}]},
+        -3.5e-2,
+        "日本",
+        True,
+        False,
+        None,
+        0,
+        12345678901234567890,
+        [],
+        {},
+    ]
+    payload = json.dumps(document, ensure_ascii=False).encode("utf-8")
+    assert parse_in_chunks(payload, size) == document
+
+
+def test_parser_waits_for_a_number_split_across_chunks():
+    parser = JSONArrayStreamParser()
+    assert parser.feed(b"[1, 109.") == [1]
+    assert parser.feed(b"95, 2e") == [109.95]
+    assert parser.feed(b"3]") == [2e3]
+    assert parser.close() == []
+
+
+def test_parser_yields_completed_elements_before_the_array_ends():
+    parser = JSONArrayStreamParser()
+    assert parser.feed(b'[{"id": 1}, {"id": 2}, {"id"') == [{"id": 1}, {"id": 2}]
+    assert parser.feed(b": 3}]") == [{"id": 3}]
+    assert parser.close() == []
+
+
+def test_parser_accepts_an_empty_array():
+    assert parse_in_chunks(b" [ ] ", 1) == []
+
+
+@pytest.mark.parametrize("payload", [b'[{"id": 1}, {"id": 2}', b"[1, 2,", b""])
+def test_parser_rejects_a_truncated_array(payload):
+    parser = JSONArrayStreamParser()
+    parser.feed(payload)
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_parser_rejects_a_non_array_body():
+    with pytest.raises(ValueError):
+        JSONArrayStreamParser().feed(b'{"products": []}')
+
+
+def test_parser_rejects_data_after_the_array():
+    parser = JSONArrayStreamParser()
+    with pytest.raises(ValueError):
+        parser.feed(b"[1] [2]")
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    products = generate_products(PRODUCT_COUNT)
+    # Small pages and chunks so pagination and chunk boundaries are exercised at this catalog size
+    app, state = create_stub_upstream(products, page_size=400, chunk_size=4096)
+    server = LocalServer()
+    server.start(app)
+    yield server.base_url, state
+    server.stop()
+
+
+def layouts(base_url):
+    return {
+        "whole": [f"{base_url}/products"],
+        "paginated": [f"{base_url}/products/page/{{page}}"],
+        "sharded": [f"{base_url}/shards/{shard}" for shard in range(4)],
+    }
+
+
+@pytest.mark.parametrize("layout", ["whole", "paginated", "sharded"])
+def test_sync_is_skipped_when_upstream_is_unchanged_and_redone_when_it_changes(upstream, layout):
+    base_url, state = upstream
+
+    async def scenario():
+        repository = InMemoryProductRepository()
+        ingestor = CatalogIngestor(layouts(base_url)[layout], concurrency=4, backoff=0.01)
+        try:
+            cold = await ingestor.sync(repository)
+            assert cold.changed and cold.count == PRODUCT_COUNT
+            assert sorted(repository.by_id) == list(range(1, PRODUCT_COUNT + 1))
+
+            unchanged = await ingestor.sync(repository)
+            assert not unchanged.changed
+            assert len(repository.by_id) == PRODUCT_COUNT
+
+            state["version"] += 1
+            changed = await ingestor.sync(repository)
+            assert changed.changed and changed.count == PRODUCT_COUNT
+            assert len(repository.by_id) == PRODUCT_COUNT
+        finally:
+            await ingestor.close()
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_sync_costs_one_conditional_request_per_source(upstream):
+    base_url, _ = upstream
+    sources = layouts(base_url)["sharded"]
+
+    async def scenario():
+        ingestor = CatalogIngestor(sources, concurrency=4, backoff=0.01)
+        repository = InMemoryProductRepository()
+        try:
+            await ingestor.sync(repository)
+            return await ingestor.sync(repository)
+        finally:
+            await ingestor.close()
+
+    assert asyncio.run(scenario()).requests == len(sources)
+
+
+def test_failed_sync_leaves_the_catalog_untouched(upstream):
+    base_url, _ = upstream
+
+    async def scenario():
+        repository = InMemoryProductRepository()
+        await repository.replace_all([{"id": 1, "title": "Existing"}])
+        ingestor = CatalogIngestor([f"{base_url}/missing"], retries=0)
+        try:
+            with pytest.raises(Exception):
+                await ingestor.sync(repository)
+        finally:
+            await ingestor.close()
+        return repository.by_id
+
+    assert asyncio.run(scenario()) == {1: {"id": 1, "title": "Existing"}}
+
+
+class EditableUpstream:
+    """Serves ``pages`` (path -> product list, or None for 404) with content-derived ETags."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __call__(self, request):
+        products = self.pages.get(request.url.path)
+        if products is None:
+            return httpx.Response(404)
+        etag = '"%s"' % hashlib.sha1(json.dumps(products).encode()).hexdigest()[:12]
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, json=products, headers={"ETag": etag})
+
+
+def editable_ingestor(upstream, sources):
+    ingestor = CatalogIngestor(sources, retries=0)
+    ingestor._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    return ingestor
+
+
+def products(*ids):
+    return [{"id": product_id, "title": f"Product {product_id}"} for product_id in ids]
+
+
+PAGED = ["http://upstream/page/{page}"]
+SHARDED = ["http://upstream/shard/1", "http://upstream/shard/2"]
+
+
+@pytest.mark.parametrize("pages, sources, edit", [
+    # The last page of products empties out; the pages before it answer 304
+    ({"/page/1": products(1, 2), "/page/2": products(3), "/page/3": []}, PAGED, {"/page/2": []}),
+    # ... or disappears
+    ({"/page/1": products(1, 2), "/page/2": products(3), "/page/3": []}, PAGED, {"/page/2": None, "/page/3": None}),
+    # A shard empties out while the other answers 304
+    ({"/shard/1": products(1, 2), "/shard/2": products(3)}, SHARDED, {"/shard/2": []}),
+    # ... or disappears
+    ({"/shard/1": products(1, 2), "/shard/2": products(3)}, SHARDED, {"/shard/2": None}),
+])
+def test_a_catalog_that_shrinks_behind_304s_is_resynced(pages, sources, edit):
+    async def scenario():
+        upstream = EditableUpstream(pages)
+        ingestor = editable_ingestor(upstream, sources)
+        repository = InMemoryProductRepository()
+        try:
+            await ingestor.sync(repository)
+            assert sorted(repository.by_id) == [1, 2, 3]
+            pages.update(edit)
+            shrunk = await ingestor.sync(repository)
+            # Once applied, the smaller catalog is the new baseline
+            return shrunk, sorted(repository.by_id), await ingestor.sync(repository)
+        finally:
+            await ingestor.close()
+
+    shrunk, ids, repeat = asyncio.run(scenario())
+    assert shrunk.changed and shrunk.count == 2 and ids == [1, 2]
+    assert not repeat.changed
+
+
+def test_dropping_a_source_is_a_change():
+    async def scenario():
+        ingestor = editable_ingestor(EditableUpstream({"/shard/1": products(1, 2), "/shard/2": products(3)}), SHARDED)
+        repository = InMemoryProductRepository()
+        try:
+            await ingestor.sync(repository)
+            ingestor.sources = SHARDED[:1]
+            return await ingestor.sync(repository), sorted(repository.by_id)
+        finally:
+            await ingestor.close()
+
+    result, ids = asyncio.run(scenario())
+    assert result.changed and ids == [1, 2]
+
+
+def test_validators_carried_to_another_ingestor_skip_an_unchanged_catalog():
+    async def scenario():
+        upstream = EditableUpstream({"/shard/1": products(1, 2), "/shard/2": products(3)})
+        first, second = editable_ingestor(upstream, SHARDED), editable_ingestor(upstream, SHARDED)
+        repository = InMemoryProductRepository()
+        try:
+            await first.sync(repository)
+            # What the server does through CatalogVersionRepository when another worker wins the lease
+            second.validators = json.loads(json.dumps(first.validators))
+            return await second.sync(repository)
+        finally:
+            await first.close()
+            await second.close()
+
+    result = asyncio.run(scenario())
+    assert not result.changed and result.requests == 2
@@ -0,0 +1,161 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from repositories import InMemoryOrderRepository, MongoOrderRepository
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def backend(request):
+    """``(orders, add_legacy_order)``; legacy orders are written the way they were before summaries existed."""
+    if request.param == "memory":
+        orders = InMemoryOrderRepository()
+
+        async def add_legacy(order):
+            orders.by_user.setdefault(order["user_id"], []).append(dict(order))
+
+        return orders, add_legacy
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["orders_test"]
+    orders = MongoOrderRepository(db)
+
+    async def add_legacy(order):
+        await db.orders.insert_one(dict(order))
+
+    asyncio.run(db.order_summaries.create_index("user_id", unique=True))
+    return orders, add_legacy
+
+
+def make_order(order_id, created_at, amount=10.0, user_id="user-1"):
+    return {"id": order_id, "user_id": user_id, "items": [{"product_id": 1, "quantity": 1}], "total_amount": amount,
+            "created_at": created_at, "status": "confirmed"}
+
+
+def naive(value):
+    return value.replace(tzinfo=None) if value is not None else None
+
+
+def test_pages_walk_the_history_once_with_ties_on_created_at(backend):
+    orders, _ = backend
+
+    async def scenario():
+        # Three orders share a timestamp; the id breaks the tie
+        stamps = [START, START + timedelta(minutes=1), START + timedelta(minutes=1), START + timedelta(minutes=1), START + timedelta(minutes=2)]
+        for number, created_at in enumerate(stamps):
+            await orders.insert(make_order(f"order-{number}", created_at))
+        pages, before = [], None
+        while True:
+            page = await orders.page_for_user("user-1", 2, before=before)
+            pages.append([order["id"] for order in page])
+            if len(page) < 2:
+                return pages
+            before = (page[-1]["created_at"], page[-1]["id"])
+
+    assert asyncio.run(scenario()) == [["order-4", "order-3"], ["order-2", "order-1"], ["order-0"]]
+
+
+def test_a_full_last_page_is_followed_by_an_empty_one(backend):
+    orders, _ = backend
+
+    async def scenario():
+        for number in range(4):
+            await orders.insert(make_order(f"order-{number}", START + timedelta(minutes=number)))
+        last = (await orders.page_for_user("user-1", 4))[-1]
+        return await orders.page_for_user("user-1", 4, before=(last["created_at"], last["id"]))
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_orders_can_be_listed_without_items(backend):
+    orders, _ = backend
+
+    async def scenario():
+        await orders.insert(make_order("order-1", START))
+        await orders.insert(make_order("order-2", START, user_id="user-2"))
+        return await orders.page_for_user("user-1", 10, include_items=False), await orders.page_for_user("user-1", 10)
+
+    summary_page, full_page = asyncio.run(scenario())
+    assert [set(order) for order in summary_page] == [{"id", "user_id", "total_amount", "created_at", "status"}]
+    assert full_page[0]["items"] == [{"product_id": 1, "quantity": 1}]
+
+
+def test_summary_folds_in_history_placed_before_summaries_existed(backend):
+    orders, add_legacy = backend
+
+    async def scenario():
+        await add_legacy(make_order("legacy-1", START, 5.0))
+        await add_legacy(make_order("legacy-2", START + timedelta(days=1), 7.5))
+        # An order placed after the deploy but before anyone read the summary
+        await orders.insert(make_order("new-1", START + timedelta(days=2), 10.0))
+        await orders.record_in_summary("user-1", 10.0, START + timedelta(days=2))
+        first = await orders.get_summary("user-1")
+        await orders.insert(make_order("new-2", START + timedelta(days=3), 2.5))
+        await orders.record_in_summary("user-1", 2.5, START + timedelta(days=3))
+        return first, await orders.get_summary("user-1")
+
+    first, second = asyncio.run(scenario())
+    assert (first["order_count"], first["lifetime_spend"], naive(first["last_order_at"])) == (3, 22.5, naive(START + timedelta(days=2)))
+    assert (second["order_count"], second["lifetime_spend"], naive(second["last_order_at"])) == (4, 25.0, naive(START + timedelta(days=3)))
+
+
+def test_backfill_between_insert_and_record_counts_the_order_once(backend):
+    orders, add_legacy = backend
+
+    async def scenario():
+        await add_legacy(make_order("legacy-1", START, 5.0))
+        await orders.insert(make_order("new-1", START + timedelta(days=1), 10.0))
+        await orders.get_summary("user-1")
+        await orders.record_in_summary("user-1", 10.0, START + timedelta(days=1))
+        # A second backfill attempt must not add the history again
+        return await orders.get_summary("user-1")
+
+    summary = asyncio.run(scenario())
+    assert (summary["order_count"], summary["lifetime_spend"]) == (2, 15.0)
+
+
+def test_user_without_orders_has_no_summary(backend):
+    orders, add_legacy = backend
+
+    async def scenario():
+        await add_legacy(make_order("legacy-1", START, 5.0, user_id="someone-else"))
+        return await orders.get_summary("user-1")
+
+    assert asyncio.run(scenario()) is None
+
+
+async def register(api):
+    response = await api.post("/api/auth/register", json={"email": f"{uuid.uuid4().hex}@example.com", "password": "secret123", "name": "Test"})
+    response.raise_for_status()
+    body = response.json()
+    return {"Authorization": f"Bearer {body['access_token']}"}, body["user"]["id"]
+
+
+def test_order_history_route_rejects_a_malformed_cursor(api):
+    async def scenario():
+        async with api:
+            headers, _ = await register(api)
+            return [(await api.get("/api/orders", params={"cursor": cursor}, headers=headers)).status_code
+                    for cursor in ("not-base64!", "bm8tc2VwYXJhdG9y")]
+
+    assert asyncio.run(scenario()) == [400, 400]
+
+
+def test_order_history_route_pages_with_an_opaque_cursor(server, api):
+    async def scenario():
+        async with api:
+            headers, user_id = await register(api)
+            for number in range(3):
+                await server.repos.orders.insert(make_order(f"{user_id}-{number}", START + timedelta(minutes=number), user_id=user_id))
+            first = (await api.get("/api/orders", params={"limit": 2, "include_items": "false"}, headers=headers)).json()
+            second = (await api.get("/api/orders", params={"limit": 2, "cursor": first["next_cursor"]}, headers=headers)).json()
+            return user_id, first, second
+
+    user_id, first, second = asyncio.run(scenario())
+    assert [order["id"] for order in first["orders"]] == [f"{user_id}-2", f"{user_id}-1"]
+    assert first["has_more"] and "items" not in first["orders"][0]
+    assert [order["id"] for order in second["orders"]] == [f"{user_id}-0"]
+    assert not second["has_more"] and second["next_cursor"] is None
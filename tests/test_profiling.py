@@ -0,0 +1,111 @@
+import asyncio
+
+import httpx
+import pytest
+
+from profiling import ProfilingMiddleware, RequestProfiler, to_thread_profiled
+
+PROFILING_ROUTES = [
+    ("GET", "/api/admin/profiling", None),
+    ("PUT", "/api/admin/profiling", {"enabled": True, "sample_rate": 1}),
+    ("DELETE", "/api/admin/profiling", None),
+    ("GET", "/api/admin/profiling/1", None),
+]
+
+
+def call_all(api, headers=None):
+    async def scenario():
+        async with api:
+            return [(await api.request(method, path, json=body, headers=headers)).status_code
+                    for method, path, body in PROFILING_ROUTES]
+
+    return asyncio.run(scenario())
+
+
+def test_profiling_routes_are_closed_without_an_admin_token(server, api, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", None)
+    monkeypatch.setattr(server.profiler, "enabled", False)
+    assert call_all(api, headers={"X-Admin-Token": ""}) == [403, 403, 403, 403]
+    assert not server.profiler.enabled
+
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_profiling_routes_require_the_configured_token(server, api, monkeypatch, token):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(server.profiler, "enabled", False)
+    assert call_all(api, headers={"X-Admin-Token": token} if token else None) == [403, 403, 403, 403]
+    assert not server.profiler.enabled
+
+
+def test_profiling_routes_accept_the_configured_token(server, api, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(server.profiler, "enabled", False)
+    try:
+        statuses = call_all(api, headers={"X-Admin-Token": "secret"})
+        # With sampling at 1 the DELETE itself may be captured, so the download is found or not
+        assert statuses[:3] == [200, 200, 200] and statuses[3] in (200, 404)
+        assert server.profiler.enabled
+    finally:
+        server.profiler.configure(enabled=False)
+
+
+def busy_search_in_thread(n):
+    return sum(i * i for i in range(n))
+
+
+def busy_on_loop(n):
+    return sum(i for i in range(n))
+
+
+async def search_app(scope, receive, send):
+    await busy_thread_work()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def busy_thread_work():
+    busy_on_loop(1000)
+    return await to_thread_profiled(busy_search_in_thread, 10000)
+
+
+def profile_one_request(app, profiler):
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=ProfilingMiddleware(app, profiler)), base_url="http://testserver")
+        async with client:
+            return (await client.get("/search")).status_code
+
+    assert asyncio.run(scenario()) == 200
+    [entry] = profiler.profiles
+    return RequestProfiler.render_text(entry, limit=None)
+
+
+def test_capture_includes_work_handed_to_a_thread():
+    report = profile_one_request(search_app, RequestProfiler(enabled=True, sample_rate=1.0))
+    assert "busy_search_in_thread" in report
+    assert "busy_on_loop" in report
+
+
+def test_ai_query_capture_shows_the_search(server, api, monkeypatch):
+    from backend_benchmark import generate_products
+
+    monkeypatch.setattr(server, "embedding_index", None)
+    monkeypatch.setattr(server, "profiler", RequestProfiler(enabled=True, sample_rate=1.0, slow_threshold_ms=0))
+    if server.model is None:
+        server.init_ai_model()
+
+    async def scenario():
+        await server.repos.products.replace_all(generate_products(200))
+        # Reached through the middleware stack built at startup, so swap the profiler it holds
+        app = ProfilingMiddleware(server.app, server.profiler)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+        async with client:
+            email = f"{id(client)}@example.com"
+            token = (await client.post("/api/auth/register", json={"email": email, "password": "secret123", "name": "T"})).json()["access_token"]
+            server.profiler.clear()
+            response = await client.post("/api/ai/query", json={"query": "wireless headphones", "limit": 5},
+                                         headers={"Authorization": f"Bearer {token}"})
+            return response.status_code
+
+    assert asyncio.run(scenario()) == 200
+    entry = next(entry for entry in server.profiler.profiles if entry["path"] == "/api/ai/query")
+    assert "_search_products" in RequestProfiler.render_text(entry, limit=None)
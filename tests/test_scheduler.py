@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+
+from repositories import InMemoryLeaseRepository, MongoLeaseRepository
+from scheduler import LeasedJob, LeaseHeld
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def leases(request):
+    if request.param == "memory":
+        return InMemoryLeaseRepository()
+    # The Mongo queries run against mongomock when it is installed
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return MongoLeaseRepository(mongomock_motor.AsyncMongoMockClient()["scheduler_test"])
+
+
+def test_only_renew_extends_a_held_lease(leases):
+    async def scenario():
+        assert await leases.acquire("job", "a", 60)
+        assert not await leases.acquire("job", "a", 60)
+        assert not await leases.acquire("job", "b", 60)
+        assert await leases.renew("job", "a", 60)
+        assert not await leases.renew("job", "b", 60)
+        await leases.release("job", "a", completed=True)
+        assert await leases.acquire("job", "b", 60)
+        assert (await leases.get("job"))["completed_at"] is not None
+
+    asyncio.run(scenario())
+
+
+def test_an_expired_lease_can_be_taken_over(leases):
+    async def scenario():
+        assert await leases.acquire("job", "a", 0)
+        await asyncio.sleep(0.01)
+        assert await leases.acquire("job", "b", 60)
+        assert not await leases.renew("job", "a", 60)
+
+    asyncio.run(scenario())
+
+
+def test_overlapping_runs_on_one_worker_run_the_job_once(leases):
+    runs = []
+
+    async def job():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return True
+
+    async def scenario():
+        leased = LeasedJob("sync", job, leases, interval=60, min_interval=0)
+
+        async def forced():
+            try:
+                return await leased.run_once(force=True)
+            except LeaseHeld:
+                return "held"
+
+        results = await asyncio.gather(leased.run_once(), forced(), leased.run_once())
+        # The next run starts cleanly once the first has released the lease
+        return results, await leased.run_once(force=True)
+
+    assert asyncio.run(scenario()) == ([True, "held", False], True)
+    assert len(runs) == 2
+
+
+def test_forced_run_is_refused_while_another_worker_holds_the_lease(leases):
+    async def scenario():
+        await leases.acquire("sync", "other-worker", 60)
+        leased = LeasedJob("sync", lambda: None, leases, interval=60)
+        assert not await leased.run_once()
+        with pytest.raises(LeaseHeld):
+            await leased.run_once(force=True)
+
+    asyncio.run(scenario())
+
+
+def test_recently_completed_job_is_skipped_unless_forced(leases):
+    runs = []
+
+    async def job():
+        runs.append(1)
+        return True
+
+    async def scenario():
+        leased = LeasedJob("sync", job, leases, interval=60)
+        assert await leased.run_once()
+        assert not await leased.run_once()
+        assert await leased.run_once(force=True)
+
+    asyncio.run(scenario())
+    assert len(runs) == 2
+
+
+def run_loops(jobs, seconds):
+    async def scenario():
+        for job in jobs:
+            job.start()
+        await asyncio.sleep(seconds)
+        for job in jobs:
+            await job.stop()
+
+    asyncio.run(scenario())
+
+
+def test_scheduled_runs_follow_the_jittered_interval_without_skips(leases):
+    interval, jitter, runs = 0.2, 0.1, []
+
+    async def job():
+        runs.append(time.perf_counter())
+        return True
+
+    run_loops([LeasedJob("sync", job, leases, interval=interval, jitter=jitter)], 2.1)
+    gaps = [later - earlier for earlier, later in zip(runs, runs[1:])]
+    # A skipped tick would show up as a gap of about two intervals
+    assert len(runs) >= 9
+    assert all(interval * (1 - jitter) - 0.01 <= gap <= interval * (1 + jitter) + 0.05 for gap in gaps), gaps
+
+
+def test_workers_booting_together_run_the_job_once(leases):
+    runs = []
+
+    async def job():
+        runs.append(time.perf_counter())
+        return True
+
+    # Boot runs land within interval * jitter of each other; the next tick is a full interval away
+    jobs = [LeasedJob("sync", job, leases, interval=1.0, jitter=0.1) for _ in range(4)]
+    run_loops(jobs, 0.5)
+    assert len(runs) == 1
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_for_one_key_share_one_execution():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"value": len(calls)}
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("key", load) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"executed": 1, "merged": 4, "merge_ratio": 0.8, "in_flight": 0}
+
+
+def test_different_keys_and_later_calls_execute_separately():
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    async def scenario():
+        flight = SingleFlight("test")
+        first = await asyncio.gather(flight.do("a", lambda: load("a")), flight.do("b", lambda: load("b")))
+        # The flight for "a" has landed, so this one runs again
+        return first, await flight.do("a", lambda: load("a"))
+
+    assert asyncio.run(scenario()) == (["a", "b"], "a")
+    assert calls == ["a", "b", "a"]
+
+
+def test_an_error_reaches_every_waiter_and_is_not_cached():
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("backend down")
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+        retry = await flight.do("key", lambda: asyncio.sleep(0, result="ok"))
+        return results, retry
+
+    results, retry = asyncio.run(scenario())
+    assert len(attempts) == 1
+    assert [type(result) for result in results] == [ValueError] * 3 and results[0] is results[1] is results[2]
+    assert retry == "ok"
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        leader = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "done"
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from backend_benchmark import generate_products
+
+from repositories import InMemoryProductRepository
+from suggest import SuggestIndex, SuggestIndexCache, _words
+
+
+def product(id, title, category, rate, count=10):
+    return {"id": id, "title": title, "category": category, "price": 1.0, "image": "", "rating": {"rate": rate, "count": count}}
+
+
+PRODUCTS = [
+    product(1, "Wireless Headphones", "electronics", 4.5),
+    product(2, "Wired Headphones", "electronics", 4.8),
+    product(3, "Leather Jacket", "men's clothing", 4.9),
+    product(4, "Rain Jacket", "women's clothing", 3.1),
+    product(5, "Wireless Mouse", "electronics", 4.5, count=50),
+    product(6, "Gold Ring", "jewelery", 2.0),
+]
+
+
+def ids(result):
+    return [item["id"] for item in result["products"]]
+
+
+def test_single_word_prefix_is_ranked_by_rating_then_reviews():
+    index = SuggestIndex.build(PRODUCTS)
+    assert ids(index.suggest("wire")) == [2, 5, 1]
+    assert ids(index.suggest("wire", limit=2)) == [2, 5]
+    assert index.suggest("elec")["categories"] == ["electronics"]
+
+
+def test_every_query_word_must_prefix_a_product_word():
+    index = SuggestIndex.build(PRODUCTS)
+    assert ids(index.suggest("wireless head")) == [1]
+    assert ids(index.suggest("ja mens")) == [3]
+    assert ids(index.suggest("jacket ring")) == []
+
+
+def test_apostrophes_do_not_split_words():
+    index = SuggestIndex.build(PRODUCTS)
+    assert index.suggest("women")["categories"] == ["women's clothing"]
+    assert ids(index.suggest("womens jack")) == [4]
+
+
+def test_empty_or_unmatched_queries_return_nothing():
+    index = SuggestIndex.build(PRODUCTS)
+    assert index.suggest("  ") == {"products": [], "categories": []}
+    assert index.suggest("zzz") == {"products": [], "categories": []}
+
+
+def test_rebuild_picks_up_catalog_changes():
+    async def scenario():
+        repository = InMemoryProductRepository()
+        await repository.replace_all(PRODUCTS)
+        cache = SuggestIndexCache(repository)
+        before = ids((await cache.get()).suggest("gold"))
+        await repository.replace_all(PRODUCTS + [product(7, "Gold Necklace", "jewelery", 5.0)])
+        stale = ids((await cache.get()).suggest("gold"))
+        await cache.rebuild()
+        return before, stale, ids((await cache.get()).suggest("gold"))
+
+    assert asyncio.run(scenario()) == ([6], [6], [7, 6])
+
+
+def test_short_prefix_queries_stay_fast_on_a_large_catalog():
+    products = generate_products(100_000)
+    index = SuggestIndex.build(products)
+    words = {product["id"]: _words(f"{product['title']} {product['category']}") for product in products}
+
+    for query in ["1 e", "9 s", "1 2", "1 2 3", "w c", "12 ring", "wireless hea"]:
+        terms = _words(query)
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            result = index.suggest(query)
+            timings.append(time.perf_counter() - start)
+        # The unbounded posting-list merge took ~100ms here; lookups now run well under 1ms
+        assert min(timings) < 0.005, query
+        matching = [id for id, product_words in words.items() if all(any(word.startswith(term) for word in product_words) for term in terms)]
+        assert set(ids(result)) <= set(matching) and len(result["products"]) == min(len(matching), 8), query